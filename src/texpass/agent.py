@@ -0,0 +1,319 @@
+"""
+Agent that unlocks accounts once and serves their entries over a Unix socket
+
+Like ssh-agent, anyone who can connect to the socket can use the unlocked accounts,
+so the socket is created in a directory only the user running the agent can access.
+Accounts are locked again after a fixed time to live.
+
+Start with `texpass-agent` in the directory of the database. Commands find it through TEXPASS_AGENT_SOCK,
+or the default socket path
+"""
+import os
+import sys
+import json
+import signal
+import socket
+import asyncio
+from argparse import ArgumentParser
+from time import monotonic
+
+from texpass.helper.agent_client import default_socket_path, database_path, AGENT_SOCKET_ENV
+from texpass.exceptions.exceptions import AgentLocked, AgentError, EntryAlreadyExists, InvalidArguments
+
+# seconds an account stays unlocked
+DEFAULT_TTL = 15 * 60
+
+# key derivations allowed at the same time. Each one allocates the Argon2 memory cost of its account
+DEFAULT_MAX_KDF = 1
+
+# longest request line accepted
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+class Session:
+    """
+    An unlocked account, with the timer that locks it again
+    """
+    def __init__(self, controller, ttl: float, expire):
+        self.controller = controller
+        self.expires_at = monotonic() + ttl
+        self.timer = asyncio.get_running_loop().call_later(ttl, expire)
+
+    def expires_in(self) -> float:
+        return max(self.expires_at - monotonic(), 0)
+
+    def close(self):
+        self.timer.cancel()
+        self.controller.password_cache.clear()
+        self.controller.account.lock()
+
+
+class Agent:
+    """
+    Serves requests for unlocked accounts. Every client connection is handled concurrently,
+    and database and crypto work runs in threads so a slow request does not hold up the others
+    """
+    def __init__(self, database: str, ttl: float = DEFAULT_TTL, max_kdf: int = DEFAULT_MAX_KDF):
+        self.database = database
+        self.ttl = ttl
+        self.kdf_slots = asyncio.Semaphore(max_kdf)
+        self.sessions: dict[str, Session] = {}
+        # one unlock per account at a time, so concurrent unlocks of an account derive its key once
+        self.unlocking: dict[str, asyncio.Lock] = {}
+
+        self.handlers = {
+            "status": self.status,
+            "unlock": self.unlock,
+            "lock": self.lock,
+            "get": self.get,
+            "list": self.list,
+            "search": self.search,
+            "add": self.add,
+            "copy": self.copy,
+        }
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Answer every request line of a connection, in order
+        """
+        try:
+            while line := await reader.readline():
+                response = await self.respond(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # client went away, or sent a line over the limit
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, line: bytes) -> dict:
+        try:
+            request = json.loads(line)
+            handler = self.handlers.get(request["op"])
+        except (ValueError, KeyError, TypeError):
+            return {"ok": False, "code": "error", "error": "Malformed request"}
+
+        if request.get("database", self.database) != self.database:
+            return {"ok": False, "code": "database", "error": f"Agent serves {self.database}"}
+        if handler is None:
+            return {"ok": False, "code": "error", "error": f"Unknown request {request['op']}"}
+
+        try:
+            return {"ok": True, "result": await handler(request)}
+        except AgentLocked:
+            return {"ok": False, "code": "locked", "error": "Account is locked"}
+        except (AgentError, InvalidArguments) as error:
+            return {"ok": False, "code": "error", "error": str(error)}
+        except EntryAlreadyExists:
+            return {"ok": False, "code": "error", "error": "Entry already exists"}
+        except KeyError as error:
+            return {"ok": False, "code": "error", "error": f"Missing field {error}"}
+        except Exception as error:
+            return {"ok": False, "code": "error", "error": f"{type(error).__name__}: {error}"}
+
+    async def session(self, request: dict):
+        """
+        TableController of the unlocked account of a request. Raises AgentLocked if it is not unlocked
+
+        An account whose master password or key parameters were changed by another process is locked,
+        as its key no longer decrypts the entries, and anything added with it could not be read again
+        """
+        session = self.sessions.get(request["account"])
+
+        if session is None:
+            raise AgentLocked()
+
+        if await asyncio.to_thread(session.controller.account.login_changed):
+            self.expire(request["account"])
+            raise AgentLocked()
+
+        return session.controller
+
+    def derive(self, account_name: str, password: str):
+        """
+        Verify the master password and derive the key. Blocking, runs in a thread
+
+        One after the other rather than at the same time like logging in does, so an unlock takes one KDF slot
+        """
+        from texpass.controller.login import LoginController
+        from texpass.controller.table_controller import TableController
+
+        status = LoginController().log_in(account_name, password, derive_key = False)
+
+        if not status.status:
+            raise AgentError(status.message)
+
+        account = status.account
+        account.get_key()
+
+        return TableController(account)
+
+    def expire(self, account_name: str):
+        session = self.sessions.pop(account_name, None)
+
+        if session is not None:
+            session.close()
+
+    def lock_all(self):
+        for account_name in list(self.sessions):
+            self.expire(account_name)
+
+    async def status(self, request: dict):
+        """
+        Seconds until the account is locked, or of every unlocked account if none is given
+        """
+        if "account" not in request:
+            return {name: session.expires_in() for name, session in self.sessions.items()}
+
+        await self.session(request)
+        session = self.sessions.get(request["account"])
+
+        if session is None:
+            raise AgentLocked()
+
+        return session.expires_in()
+
+    async def unlock(self, request: dict):
+        account_name = request["account"]
+        lock = self.unlocking.setdefault(account_name, asyncio.Lock())
+
+        async with lock:
+            if account_name not in self.sessions:
+                async with self.kdf_slots:
+                    controller = await asyncio.to_thread(self.derive, account_name, request["password"])
+
+                self.sessions[account_name] = Session(controller, self.ttl, lambda: self.expire(account_name))
+
+        return self.sessions[account_name].expires_in()
+
+    async def lock(self, request: dict):
+        """
+        Lock one account, or every account if none is given. Returns how many were locked
+        """
+        if "account" not in request:
+            locked = len(self.sessions)
+            self.lock_all()
+            return locked
+
+        locked = int(request["account"] in self.sessions)
+        self.expire(request["account"])
+        return locked
+
+    async def get(self, request: dict):
+        controller = await self.session(request)
+
+        def get_password():
+            return controller.get_password_at(controller.find_entry(request["website"], request.get("user")))
+
+        return await asyncio.to_thread(get_password)
+
+    async def list(self, request: dict):
+        return await self.search({**request, "query": ""})
+
+    async def search(self, request: dict):
+        from texpass.model.table import match_terms
+
+        controller = await self.session(request)
+        records = await asyncio.to_thread(controller.account.get_all_records)
+
+        return match_terms(records, request["query"])
+
+    async def add(self, request: dict):
+        controller = await self.session(request)
+
+        def add_entry():
+            password = controller.make_password() if request.get("generate") else request["password"]
+            controller.add_entry(request["username"], request["website"], password)
+
+        await asyncio.to_thread(add_entry)
+        return "Entry added"
+
+    async def copy(self, request: dict):
+        controller = await self.session(request)
+
+        def copy_password():
+            controller.copy_password_at(controller.find_entry(request["website"], request.get("user")))
+
+        await asyncio.to_thread(copy_password)
+        return "Password has been copied"
+
+
+def prepare_socket_path(path: str):
+    """
+    Make sure the socket directory exists and only this user can access it, and that no agent is using path
+
+    Exits with an error message otherwise
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    info = os.stat(directory)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        sys.exit(f"{directory} has to be owned by you and not accessible by others")
+
+    if os.path.exists(path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(path)
+            except ConnectionRefusedError:
+                # left over from an agent that did not shut down cleanly
+                os.unlink(path)
+            else:
+                sys.exit(f"An agent is already listening on {path}")
+
+
+async def serve(agent: Agent, path: str):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    for signal_ in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_, stop.set)
+
+    old_umask = os.umask(0o177)
+    try:
+        server = await asyncio.start_unix_server(agent.handle_client, path, limit=MAX_REQUEST_BYTES)
+    finally:
+        os.umask(old_umask)
+
+    # same output as ssh-agent, so it can be used with eval
+    print(f"{AGENT_SOCKET_ENV}={path}; export {AGENT_SOCKET_ENV};", flush=True)
+
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        agent.lock_all()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def main(argv: list[str] = None) -> int:
+    from texpass import setup_app
+    from texpass.helper.storage import configure_storage, close_storage
+
+    parser = ArgumentParser(prog="texpass-agent", description="Keep texpass accounts unlocked for commands")
+    parser.add_argument("-s", "--socket", default=default_socket_path(), help=f"socket path, defaults to ${AGENT_SOCKET_ENV}")
+    parser.add_argument("-t", "--ttl", type=float, default=DEFAULT_TTL, help="seconds an account stays unlocked")
+    parser.add_argument("--max-kdf", type=int, default=DEFAULT_MAX_KDF, help="key derivations allowed at the same time")
+    args = parser.parse_args(argv)
+
+    prepare_socket_path(args.socket)
+
+    setup_app.setup_database()
+    # requests name the database they expect by absolute path
+    configure_storage(path=database_path())
+
+    async def run():
+        await serve(Agent(database_path(), args.ttl, args.max_kdf), args.socket)
+
+    try:
+        asyncio.run(run())
+    finally:
+        close_storage()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+from textual.app import App
+from textual.worker import get_current_worker
+from textual import work
+
+from texpass.controller.screen_controller import ScreenController
+
+
+class MainApp(App):
+
+    def on_mount(self):
+        ScreenController(self).push_login()
+        # start importing what is needed after login once the login screen is painted
+        self.call_after_refresh(self.preload_modules)
+
+    @work(thread=True, exclusive=True, group="preload")
+    def preload_modules(self):
+        """
+        Import crypto, clipboard and table modules while the user types
+        """
+        from texpass.helper.preload import preload
+
+        worker = get_current_worker()
+        preload(is_cancelled=lambda: worker.is_cancelled)
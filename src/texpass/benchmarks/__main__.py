@@ -0,0 +1,3 @@
+from texpass.benchmarks.suite import main
+
+main()
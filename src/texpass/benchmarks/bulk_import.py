@@ -0,0 +1,56 @@
+"""
+Time to bulk import a CSV export into a fresh account
+
+Run with `python -m texpass.benchmarks.bulk_import`
+"""
+from argparse import ArgumentParser
+from io import StringIO
+from time import perf_counter
+
+from texpass.controller.table_controller import TableController
+from texpass.helper.importer import read_csv
+from texpass.benchmarks.vault import temporary_vault
+
+
+def make_csv(entries: int) -> StringIO:
+    """
+    CSV export with entries rows, the last percent of which repeat earlier rows
+    """
+    unique = entries - entries // 100
+    stream = StringIO()
+    stream.write("name,url,username,password\n")
+
+    for i in range(entries):
+        i %= unique
+        stream.write(f"Site {i},https://site{i}.example.com,user{i},password-{i}\n")
+
+    stream.seek(0)
+    return stream
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    stream = make_csv(args.entries)
+
+    with temporary_vault(0) as account:
+        controller = TableController(account)
+        controller.populate_internal_table()
+        # derive the key up front, it is paid once either way
+        account.get_key()
+
+        start = perf_counter()
+        report = controller.bulk_import(read_csv(stream), batch_size = args.batch_size)
+        elapsed = perf_counter() - start
+
+        stored = len(account.get_all_records())
+
+    print(f"{args.entries} rows: imported {report.imported}, {len(report.duplicates)} duplicates, {stored} stored")
+    print(f"took {elapsed:.2f} s, {report.imported / elapsed:.0f} entries per second")
+
+
+if __name__ == "__main__":
+    main()
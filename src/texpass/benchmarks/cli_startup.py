@@ -0,0 +1,105 @@
+"""
+Cold start time of command line commands, with and without key derivation
+
+Every command runs in a fresh interpreter, the way a shell would start it.
+Key derivation time is read from the trace file and subtracted, which leaves the cost of starting up.
+Exits with status 1 if a command imports Textual.
+Run with `python -m texpass.benchmarks.cli_startup`
+"""
+import os
+import sys
+import json
+import subprocess
+from argparse import ArgumentParser
+from time import perf_counter
+
+import texpass
+from texpass.helper.instrument import TRACE_ENV
+from texpass.benchmarks.vault import temporary_vault, report, synthetic_entry, BENCH_USERNAME, BENCH_PASSWORD
+
+# so the child interpreters import this same copy of texpass, even when it is not installed
+SOURCE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(texpass.__file__)))
+
+# spans that are key derivation, which every unlock pays whatever the start up cost is
+KDF_SPANS = ("argon2.hash", "argon2.verify", "account.wait_for_key", "account.get_key")
+
+
+def run_command(arguments: list[str], trace_path: str, import_time: bool = False) -> tuple[float, float, str]:
+    """
+    Run `python -m texpass` with arguments, piping in the master password
+
+    Returns wall time and key derivation time in milliseconds, and stderr
+    """
+    if os.path.exists(trace_path):
+        os.remove(trace_path)
+
+    command = [sys.executable]
+    if import_time:
+        command += ["-X", "importtime"]
+    command += ["-m", "texpass", *arguments, "--account", BENCH_USERNAME, "--no-agent"]
+
+    start = perf_counter()
+    result = subprocess.run(
+        command, input=BENCH_PASSWORD + "\n", capture_output=True, text=True,
+        env={
+            **os.environ,
+            TRACE_ENV: trace_path,
+            "PYTHONPATH": os.pathsep.join(filter(None, [SOURCE_PATH, os.environ.get("PYTHONPATH")]))
+        }
+    )
+    wall = (perf_counter() - start) * 1000
+
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(arguments)} failed: {result.stderr}")
+
+    kdf = 0.0
+    with open(trace_path) as file:
+        for line in file:
+            record = json.loads(line)
+            if record["kind"] == "span" and record["name"] in KDF_SPANS:
+                kdf += record["total_ms"]
+
+    return wall, kdf, result.stderr
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    website, username = synthetic_entry(0)
+    commands = {
+        "list": ["list"],
+        "list --search": ["list", "--search", "mail"],
+        "get": ["get", website, "--user", username],
+    }
+
+    imports_textual = []
+
+    with temporary_vault(args.entries):
+        trace_path = os.path.join(os.getcwd(), "trace.jsonl")
+        print(f"vault of {args.entries} entries, {args.repeat} runs each")
+
+        for name, arguments in commands.items():
+            walls, startups = [], []
+
+            for _ in range(args.repeat):
+                wall, kdf, _ = run_command(arguments, trace_path)
+                walls.append(wall)
+                startups.append(wall - kdf)
+
+            report(f"{name} (wall)", walls)
+            report(f"{name} (without key derivation)", startups)
+
+            _, _, import_log = run_command(arguments, trace_path, import_time=True)
+            if any(line.split("|")[-1].strip().startswith("textual") for line in import_log.splitlines()):
+                imports_textual.append(name)
+
+    if imports_textual:
+        print(f"imported Textual: {', '.join(imports_textual)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Peak memory and time of a streaming export, for vaults of increasing size
+
+Memory use should stay flat as the number of entries grows.
+Run with `python -m texpass.benchmarks.export`
+"""
+import os
+import tracemalloc
+from argparse import ArgumentParser
+from time import perf_counter
+
+from texpass.controller.table_controller import TableController
+from texpass.helper.exporter import FORMATS
+from texpass.benchmarks.vault import temporary_vault
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    for entries in args.entries:
+        with temporary_vault(entries) as account:
+            controller = TableController(account)
+            account.get_key()
+
+            for format_ in FORMATS:
+                with open(os.devnull, "w") as stream:
+                    tracemalloc.start()
+                    start = perf_counter()
+
+                    controller.export(stream, format_, batch_size = args.batch_size)
+
+                    elapsed = perf_counter() - start
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+
+                print(f"{entries:>9} entries {format_:<7} peak {peak / 1024:10.1f} KiB   {elapsed:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Time until the table first shows entries, and to load a page while scrolling, as the vault grows
+
+Exits with status 1 if first paint takes over --max-ms at any size.
+Run with `python -m texpass.benchmarks.first_paint`
+"""
+import sys
+import asyncio
+from argparse import ArgumentParser
+from time import perf_counter
+
+from texpass.controller.table_controller import TableController
+from texpass.widgets.data_table import MyTable
+from texpass.benchmarks.vault import temporary_vault, time_call, report
+from texpass.benchmarks.table_render import TableApp
+
+
+async def measure_first_paint(controller: TableController) -> tuple[float, int]:
+    """
+    Milliseconds from starting the app until the table has been drawn with rows, and how many rows it shows
+    """
+    app = TableApp(controller)
+
+    start = perf_counter()
+    async with app.run_test() as pilot:
+        table = app.query_one(MyTable)
+        await pilot.pause()
+        duration = (perf_counter() - start) * 1000
+
+        return duration, table.row_count
+
+
+def run(entries: int, repeat: int) -> float:
+    with temporary_vault(entries) as account:
+        durations = []
+
+        for _ in range(repeat):
+            duration, rows = asyncio.run(measure_first_paint(TableController(account)))
+            durations.append(duration)
+
+        controller = TableController(account)
+
+        def scroll_through():
+            controller.load_first_page()
+
+            for _ in range(10):
+                controller.load_next_page()
+
+        print(f"{entries} entries, {rows} rows shown")
+        report("first paint", durations)
+        report("per page loaded", [duration / 11 for duration in time_call(scroll_through, repeat)])
+
+    return max(durations)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    slowest = max(run(entries, args.repeat) for entries in args.sizes)
+
+    if args.max_ms is not None and slowest > args.max_ms:
+        print(f"first paint took {slowest:.1f} ms, over {args.max_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
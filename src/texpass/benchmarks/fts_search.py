@@ -0,0 +1,68 @@
+"""
+Search latency and ranking of the in-memory and FTS5 backends as the vault grows
+
+Ranking is compared as the share of the in-memory top results that the FTS5 backend also returns in its top results.
+Run with `python -m texpass.benchmarks.fts_search`
+"""
+from argparse import ArgumentParser
+from statistics import median
+
+from texpass.controller.table_controller import TableController
+from texpass.benchmarks.vault import temporary_vault, time_call, report
+from texpass.benchmarks.search import keystrokes
+
+QUERIES = ["mail12", "alex.4", "bank7.example", "shopsam", "cloud.org"]
+
+
+def top_ids(results: list, top: int) -> set[int]:
+    return {row[0] for row, _ in results[:top]}
+
+
+def run(entries: int, repeat: int, top: int):
+    with temporary_vault(entries) as account:
+        memory = TableController(account, search_backend = "memory")
+        fts = TableController(account, search_backend = "fts")
+
+        if fts.search_backend != "fts":
+            raise SystemExit("SQLite has no FTS5 trigram support")
+
+        memory.populate_internal_table()
+        queries = [query for full_query in QUERIES for query in keystrokes(full_query)]
+
+        def search_memory():
+            for query in queries:
+                # from scratch, as the first search after a change would be
+                memory.table.search.clear()
+                memory.table.get_fuzzied_records(query)[:top]
+
+        def search_fts():
+            for query in queries:
+                fts.table.get_fuzzied_records(query)[:top]
+
+        print(f"{entries} rows, {len(queries)} keystrokes")
+        report("per keystroke (memory)", [duration / len(queries) for duration in time_call(search_memory, repeat)])
+        report("per keystroke (fts)", [duration / len(queries) for duration in time_call(search_fts, repeat)])
+
+        overlaps = []
+        for query in queries:
+            expected = top_ids(memory.table.get_fuzzied_records(query), top)
+
+            if expected:
+                overlaps.append(len(expected & top_ids(fts.table.get_fuzzied_records(query), top)) / len(expected))
+
+        print(f"top {top} overlap with memory: median {median(overlaps):.0%}, min {min(overlaps):.0%}")
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    for entries in args.sizes:
+        run(entries, args.repeat, args.top)
+
+
+if __name__ == "__main__":
+    main()
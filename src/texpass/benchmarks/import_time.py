@@ -0,0 +1,120 @@
+"""
+Import time of what the TUI loads before the login screen is painted, recorded with `-X importtime`
+
+Exits with status 1 if a module that should only load after first paint is imported early,
+or if the import time is over --max-ms.
+Run with `python -m texpass.benchmarks.import_time`
+"""
+import os
+import sys
+import json
+import subprocess
+from argparse import ArgumentParser
+from statistics import median
+from time import time
+
+import texpass
+from texpass.helper.preload import POST_LOGIN_MODULES
+
+# so the child interpreters import this same copy of texpass, even when it is not installed
+SOURCE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(texpass.__file__)))
+
+# what start.py and the login screen import before the first paint
+FIRST_PAINT_IMPORTS = "import texpass.start, texpass.app, texpass.screens.login"
+
+# top level packages that must not be imported before the first paint
+DEFERRED_PACKAGES = ("argon2", "cryptography", "pyperclip")
+
+
+def import_times(code: str) -> dict[str, int]:
+    """
+    Run code in a fresh interpreter, returning self import time in microseconds of every module imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [SOURCE_PATH, os.environ.get("PYTHONPATH")]))}
+    )
+    times = {}
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_time, _, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(self_time)
+
+    return times
+
+
+def by_package(times: dict[str, int]) -> dict[str, int]:
+    packages = {}
+
+    for name, self_time in times.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_time
+
+    return packages
+
+
+def early_imports(times: dict[str, int]) -> list[str]:
+    """
+    Modules imported before the first paint that should have been deferred
+    """
+    deferred = set(POST_LOGIN_MODULES)
+
+    return sorted(
+        name for name in times
+        if name in deferred or name.split(".")[0] in DEFERRED_PACKAGES
+    )
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="fail if importing for the first paint takes longer")
+    parser.add_argument("--output", help="append totals as a JSON line to this file")
+    args = parser.parse_args()
+
+    after_login = FIRST_PAINT_IMPORTS + ", " + ", ".join(
+        name for name in POST_LOGIN_MODULES if name.startswith("texpass.")
+    )
+
+    first_paint_runs = [import_times(FIRST_PAINT_IMPORTS) for _ in range(args.repeat)]
+    after_login_runs = [import_times(after_login) for _ in range(args.repeat)]
+
+    first_paint_ms = median(sum(times.values()) for times in first_paint_runs) / 1000
+    after_login_ms = median(sum(times.values()) for times in after_login_runs) / 1000
+    packages = by_package(first_paint_runs[-1])
+    early = early_imports(first_paint_runs[-1])
+
+    print(f"before first paint: {first_paint_ms:.1f} ms, {len(first_paint_runs[-1])} modules")
+    print(f"after login:        {after_login_ms:.1f} ms, {len(after_login_runs[-1])} modules")
+    print("slowest packages before first paint:")
+    for package, self_time in sorted(packages.items(), key=lambda item: -item[1])[:8]:
+        print(f"  {package:<20} {self_time / 1000:8.1f} ms")
+
+    if args.output:
+        with open(args.output, "a") as file:
+            file.write(json.dumps({
+                "time": time(),
+                "first_paint_ms": first_paint_ms,
+                "after_login_ms": after_login_ms,
+                "first_paint_modules": len(first_paint_runs[-1]),
+                "early_imports": early,
+            }) + "\n")
+
+    failed = False
+
+    if early:
+        print(f"imported before first paint: {', '.join(early)}")
+        failed = True
+    if args.max_ms is not None and first_paint_ms > args.max_ms:
+        print(f"importing for the first paint took longer than {args.max_ms} ms")
+        failed = True
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
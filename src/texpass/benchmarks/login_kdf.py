@@ -0,0 +1,52 @@
+"""
+Time from entering the master password to a usable key, verifying then deriving versus doing both at once
+
+Run with `python -m texpass.benchmarks.login_kdf`
+"""
+from argparse import ArgumentParser
+
+from texpass.helper.account import Account
+from texpass.helper.kdf import KdfParams, DEFAULT_MEMORY_COST, available_cores, calibrated_params
+from texpass.benchmarks.vault import temporary_vault, time_call, report, BENCH_USERNAME, BENCH_PASSWORD
+
+
+def log_in_sequential():
+    account = Account.from_login(BENCH_USERNAME, BENCH_PASSWORD, derive_key = False)
+    account.get_key()
+    account.lock()
+
+
+def log_in_concurrent():
+    account = Account.from_login(BENCH_USERNAME, BENCH_PASSWORD)
+    account.get_key()
+    account.lock()
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--time-cost", type=int, default=None, help="defaults to the calibrated parameters")
+    parser.add_argument("--parallelism", type=int, default=None)
+    args = parser.parse_args()
+
+    kdf = calibrated_params()
+    if args.time_cost is not None or args.parallelism is not None:
+        kdf = KdfParams(
+            args.time_cost if args.time_cost is not None else kdf.time_cost,
+            DEFAULT_MEMORY_COST,
+            args.parallelism if args.parallelism is not None else kdf.parallelism
+        )
+
+    with temporary_vault(0):
+        # temporary_vault registers with calibrated parameters, move the account to the ones asked for
+        account = Account.from_login(BENCH_USERNAME, BENCH_PASSWORD)
+        account.upgrade_kdf(BENCH_PASSWORD, kdf)
+        account.lock()
+
+        print(f"{available_cores()} cores, {kdf}, {args.repeat} runs each")
+        report("verify, then derive key", time_call(log_in_sequential, args.repeat))
+        report("verify while deriving key", time_call(log_in_concurrent, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
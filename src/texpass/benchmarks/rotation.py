@@ -0,0 +1,41 @@
+"""
+Time to change the master password of a vault, split into key derivation and re-encryption
+
+Run with `python -m texpass.benchmarks.rotation`
+"""
+from argparse import ArgumentParser
+from time import perf_counter
+
+from texpass.helper.account import Account
+from texpass.benchmarks.vault import temporary_vault, BENCH_PASSWORD
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=50_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with temporary_vault(args.entries) as account:
+        # what the two key derivations cost on their own
+        start = perf_counter()
+        account.get_key()
+        Account(account.username, "new-" + BENCH_PASSWORD, "newsaltnewsaltne", kdf=account.kdf).get_key()
+        kdf = perf_counter() - start
+        account.lock()
+        account.password = BENCH_PASSWORD
+
+        start = perf_counter()
+        rotated = account.change_master_password("new-" + BENCH_PASSWORD, "newsaltnewsaltne", args.batch_size)
+        total = perf_counter() - start
+
+        start = perf_counter()
+        failed = account.verify_entries(args.batch_size)
+        verify = perf_counter() - start
+
+    print(f"re-encrypted {rotated} entries in {total:.2f} s, of which about {kdf:.2f} s was key derivation")
+    print(f"verified in {verify:.2f} s, {len(failed)} entries failed to decrypt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Per-keystroke fuzzy search time while typing and backspacing a query
+
+Run with `python -m texpass.benchmarks.search`
+"""
+from argparse import ArgumentParser
+from texpass.model.table import Table, IncrementalSearch
+from texpass.benchmarks.vault import time_call, report, synthetic_entries
+
+# search results the table shows at first
+RESULT_ROWS = 200
+
+
+def make_table(entries: int, seed: int = 0) -> Table:
+    """
+    Table holding the same rows as a synthetic vault, without a database
+    """
+    table = Table()
+    # IDs as a fresh database would give them
+    table.populate_table((i, *entry) for i, entry in enumerate(synthetic_entries(entries, seed), 1))
+
+    return table
+
+
+def keystrokes(query: str) -> list[str]:
+    """
+    Queries seen when typing query one character at a time, then backspacing it
+    """
+    typed = [query[:end] for end in range(1, len(query) + 1)]
+    return typed + typed[-2::-1]
+
+
+def full_sort_search(rows, query: str) -> list[tuple[tuple, float]]:
+    """
+    How searching first worked: score every row with textual's Matcher and sort all matches by score
+    """
+    from textual.fuzzy import Matcher
+
+    matcher = Matcher(query)
+    matches = [(row, matcher.match(IncrementalSearch.make_string(row))) for row in rows]
+
+    return sorted((match for match in matches if match[1] > 0), key = lambda match: match[1], reverse = True)
+
+
+def run(entries: int, query: str, repeat: int):
+    table = make_table(entries)
+    queries = keystrokes(query)
+
+    print(f"{entries} rows, typing and backspacing {query!r}, {repeat} runs each")
+
+    # caching nothing behaves like a fresh search on every keystroke
+    for label, search in [("full search", IncrementalSearch(max_queries = 0)), ("incremental", IncrementalSearch())]:
+        table.search = search
+
+        def type_query():
+            search.clear()
+            for q in queries:
+                # the first page is what the table shows
+                table.get_fuzzied_records(q)[:RESULT_ROWS]
+
+        report(f"{len(queries)} keystrokes ({label})", time_call(type_query, repeat))
+
+    # results have to be the same as a fresh search
+    fresh = IncrementalSearch(max_queries = 0)
+    for q in queries:
+        assert table.get_fuzzied_records(q) == fresh.search(table.rows(), q), q
+
+    # and ranked like sorting every match
+    for q in queries:
+        assert list(table.get_fuzzied_records(q)) == full_sort_search(table.rows(), q), q
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=50_000)
+    parser.add_argument("--query", default="mail12alex")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    run(args.entries, args.query, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
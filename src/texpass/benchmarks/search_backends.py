@@ -0,0 +1,69 @@
+"""
+Per query search time of every search backend and scorer, and of ranking only the first page of results
+
+Run with `python -m texpass.benchmarks.search_backends`
+"""
+from argparse import ArgumentParser
+
+from texpass.controller.table_controller import TableController, SEARCH_BACKENDS
+from texpass.model.scoring import SCORERS, SearchResult
+from texpass.benchmarks.vault import temporary_vault, time_call, report
+from texpass.benchmarks.search import keystrokes
+
+QUERIES = ["mail12", "alex.4", "bank7.example", "shop sam", "cloud.org"]
+
+
+def run(entries: int, repeat: int, top: int):
+    with temporary_vault(entries) as account:
+        queries = [query for full_query in QUERIES for query in keystrokes(full_query)]
+        print(f"{entries} rows, {len(queries)} keystrokes, first {top} results read")
+
+        for backend in SEARCH_BACKENDS:
+            for scorer in SCORERS:
+                controller = TableController(account, search_backend = backend, scorer = scorer)
+
+                if controller.search_backend != backend:
+                    print(f"{backend}: not available")
+                    break
+
+                controller.ensure_table_loaded()
+
+                def search():
+                    for query in queries:
+                        # from scratch, as the first search after a change would be
+                        controller.table.search.clear()
+                        controller.search(query)[:top]
+
+                durations = time_call(search, repeat)
+                report(f"per query ({backend}, {scorer})", [duration / len(queries) for duration in durations])
+
+        # ranking every match, as before results were read lazily
+        controller = TableController(account, search_backend = "memory", scorer = "fuzzy")
+        controller.ensure_table_loaded()
+        results = [controller.search(query) for query in queries]
+
+        def rank_all():
+            for result in results:
+                list(SearchResult(result.rows, result.matches))
+
+        def rank_top():
+            for result in results:
+                SearchResult(result.rows, result.matches)[:top]
+
+        report("ranking per query (all matches)", [duration / len(queries) for duration in time_call(rank_all, repeat)])
+        report(f"ranking per query (first {top})", [duration / len(queries) for duration in time_call(rank_top, repeat)])
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=200)
+    args = parser.parse_args()
+
+    for entries in args.sizes:
+        run(entries, args.repeat, args.top)
+
+
+if __name__ == "__main__":
+    main()
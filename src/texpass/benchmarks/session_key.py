@@ -0,0 +1,66 @@
+"""
+Add, edit and copy latency with and without the session key and password caches
+
+Run with `python -m texpass.benchmarks.session_key`
+"""
+from argparse import ArgumentParser
+
+from texpass.controller.table_controller import TableController
+from texpass.benchmarks.vault import temporary_vault, time_call, report, synthetic_entry, BENCH_PASSWORD
+
+
+def run(entries: int, repeat: int):
+    with temporary_vault(entries) as account:
+        controller = TableController(account)
+        controller.populate_internal_table()
+
+        counter = iter(range(10**9))
+        record_id = controller.add_entry("edited", "edited.example.com", "password")
+
+        def add():
+            i = next(counter)
+            controller.add_entry(f"new{i}", "new.example.com", "password")
+
+        def edit():
+            controller.edit_entry(record_id, "edited", "edited.example.com", "password")
+
+        copied_id = controller.table.get_record_id(*synthetic_entry(0))
+
+        def copy():
+            # clipboard access is left out, it is not what is being measured
+            controller.password_cache.clear()
+            controller.get_password_at(copied_id)
+
+        def cached_copy():
+            controller.get_password_at(copied_id)
+
+        def uncached(func):
+            def wrapped():
+                # what every operation paid before: a fresh key derivation
+                account.lock()
+                account.password = BENCH_PASSWORD
+                func()
+            return wrapped
+
+        print(f"vault of {entries} entries, {repeat} runs each")
+
+        for name, func in [("add", add), ("edit", edit), ("copy", copy)]:
+            report(f"{name} (derive key every call)", time_call(uncached(func), repeat))
+            account.get_key()
+            report(f"{name} (session key)", time_call(func, repeat))
+
+        report("copy (password cache)", time_call(cached_copy, repeat))
+        print(f"password cache: {controller.password_cache.hits} hits, {controller.password_cache.misses} misses")
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    run(args.entries, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
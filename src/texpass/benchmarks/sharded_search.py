@@ -0,0 +1,82 @@
+"""
+Per query search time of the in-memory search on one core, and split across worker processes
+
+Checks the parallel results are the best results of the single process search.
+Only as many workers as there are cores can run at once, see --workers.
+Run with `python -m texpass.benchmarks.sharded_search`
+"""
+from argparse import ArgumentParser
+
+from texpass.model.table import Table, IncrementalSearch
+from texpass.model.sharded_search import ShardedSearch
+from texpass.model.scoring import make_scorer, SCORERS
+from texpass.helper.kdf import available_cores
+from texpass.benchmarks.vault import synthetic_entries, time_call, report
+from texpass.benchmarks.search_backends import QUERIES
+
+LIMIT = 1000
+
+
+def run(entries: int, workers: list[int], scorer: str, repeat: int):
+    table = Table()
+    table.populate_table((i, *entry) for i, entry in enumerate(synthetic_entries(entries), 1))
+    rows = table.rows()
+    print(f"{entries} rows, {len(QUERIES)} queries, {scorer} scorer, {available_cores()} cores")
+
+    single = IncrementalSearch(scorer = make_scorer(scorer))
+
+    def search_single():
+        for query in QUERIES:
+            # from scratch, as every query is unrelated
+            single.clear()
+            single.search(rows, query, haystacks = rows.normalised)[:LIMIT]
+
+    report("per query (1 process)", [duration / len(QUERIES) for duration in time_call(search_single, repeat)])
+    expected = {query: single.search(rows, query, haystacks = rows.normalised)[:LIMIT] for query in QUERIES}
+
+    for worker_count in workers:
+        sharded = ShardedSearch(worker_count, limit = LIMIT, scorer = make_scorer(scorer))
+
+        try:
+            # starts the workers and shares the rows, once per version of the table
+            first = time_call(lambda: sharded.search(rows, QUERIES[0], haystacks = rows.normalised), 1)
+            report(f"first query ({worker_count} workers)", first)
+
+            def search_sharded():
+                for query in QUERIES:
+                    sharded.search(rows, query, haystacks = rows.normalised)[:LIMIT]
+
+            durations = time_call(search_sharded, repeat)
+            report(f"per query ({worker_count} workers)", [duration / len(QUERIES) for duration in durations])
+
+            for query in QUERIES:
+                if sharded.search(rows, query, haystacks = rows.normalised)[:LIMIT] != expected[query]:
+                    raise AssertionError(f"{worker_count} workers ranked {query!r} differently")
+        finally:
+            sharded.close()
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=None,
+        help="worker counts to time, by default 1, 2, 4 and so on up to the number of cores"
+    )
+    parser.add_argument("--scorer", choices=list(SCORERS), default="fuzzy")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workers = args.workers
+    if workers is None:
+        workers = [1]
+
+        while workers[-1] * 2 <= available_cores():
+            workers.append(workers[-1] * 2)
+
+    for entries in args.sizes:
+        run(entries, workers, args.scorer, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Per-operation latency of Account with a persistent connection versus a connection per call
+
+Run with `python -m texpass.benchmarks.storage`
+"""
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from sqlite3 import connect
+
+from texpass.helper.account import Account
+from texpass.helper.storage import Storage, PASSWORDS_DATABASE
+from texpass.benchmarks.vault import temporary_vault, time_call, report, synthetic_entry, BENCH_PASSWORD
+
+
+class ConnectPerCall(Storage):
+    """
+    Storage that behaves like Account did before: connect, run one statement, close
+    """
+    def fetchone(self, sql: str, params: tuple = ()) -> tuple:
+        con = connect(self.path)
+        row = con.execute(sql, params).fetchone()
+        con.close()
+        return row
+
+    def fetchall(self, sql: str, params: tuple = ()) -> list[tuple]:
+        con = connect(self.path)
+        rows = con.execute(sql, params).fetchall()
+        con.close()
+        return rows
+
+    @contextmanager
+    def transaction(self):
+        con = connect(self.path)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+
+def run(entries: int, repeat: int):
+    with temporary_vault(entries) as bench_account:
+        print(f"vault of {entries} entries, {repeat} runs each")
+
+        for label, storage in [("connect per call", ConnectPerCall()), ("persistent", Storage())]:
+            account = Account(bench_account.username, BENCH_PASSWORD, bench_account.salt, storage, bench_account.kdf)
+            token = account.get_key().encrypt(b"password").decode()
+            counter = iter(range(10**9))
+
+            def add_delete():
+                i = next(counter)
+                entry_id = account.add_entry(f"{label}{i}", "new.example.com", token)
+                account.delete_entry(entry_id)
+
+            website, username = synthetic_entry(1)
+            entry_id = next(entry_id for entry_id, entry_username in account.get_website_entries(website) if entry_username == username)
+
+            def edit():
+                account.edit_entry(entry_id, username, website, token)
+
+            def get():
+                account.get_entry_password(entry_id)
+
+            report(f"get_all_records ({label})", time_call(account.get_all_records, repeat))
+            report(f"get_entry_password ({label})", time_call(get, repeat))
+            report(f"add + delete ({label})", time_call(add_delete, repeat))
+            report(f"edit_entry ({label})", time_call(edit, repeat))
+
+            storage.close()
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    run(args.entries, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
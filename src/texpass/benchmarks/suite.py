@@ -0,0 +1,181 @@
+"""
+Model level benchmark suite over deterministic synthetic vaults
+
+Times login, loading, fuzzy search and entry operations for each vault size,
+and writes the results as JSON so runs of different versions can be compared.
+Run with `texpass-bench` or `python -m texpass.benchmarks`
+"""
+import sys
+import json
+import platform
+import tracemalloc
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from itertools import count
+from math import ceil
+
+from texpass.helper.account import Account
+from texpass.model.table import Table
+from texpass.controller.table_controller import TableController
+from texpass.benchmarks.vault import temporary_vault, time_call, synthetic_entry, BENCH_USERNAME, BENCH_PASSWORD
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+QUERY_LENGTHS = [1, 2, 4, 8, 16]
+# repeats for anything that runs the key derivation function
+KDF_REPEAT = 3
+# search results the table shows at first, only these are ranked
+RESULT_ROWS = 200
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """
+    Nearest rank percentile of already sorted values
+    """
+    rank = max(ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarise(durations: list[float]) -> dict:
+    values = sorted(durations)
+
+    return {
+        "min": values[0],
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": values[-1],
+        "mean": sum(values) / len(values),
+    }
+
+
+def peak_memory(func) -> int:
+    """
+    Peak bytes allocated by one call of func
+
+    Only counts Python allocations, memory used by native code such as Argon2 is not included
+    """
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+class Suite:
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results = []
+
+    def bench(self, name: str, entries: int, func, repeat: int = None, **params):
+        """
+        Time func, then measure its peak memory in a separate call as tracing slows it down
+        """
+        repeat = repeat or self.repeat
+        print(f"{entries:>9} entries: {name} {params or ''}", file=sys.stderr)
+
+        durations = time_call(func, repeat)
+
+        self.results.append({
+            "name": name,
+            "entries": entries,
+            "params": params,
+            "repeat": repeat,
+            "ms": summarise(durations),
+            "peak_bytes": peak_memory(func),
+        })
+
+    def run_vault(self, entries: int, query: str):
+        with temporary_vault(entries) as account:
+            self.bench("login", entries, lambda: Account.from_login(BENCH_USERNAME, BENCH_PASSWORD), KDF_REPEAT)
+            self.bench("load", entries, lambda: Table().populate_table(account.get_all_records()))
+
+            controller = TableController(account)
+            controller.populate_internal_table()
+            table = controller.table
+            account.get_key()
+
+            for length in QUERY_LENGTHS:
+                def search():
+                    # every keystroke from scratch, not reusing earlier queries
+                    table.search.clear()
+                    table.get_fuzzied_records(query[:length])[:RESULT_ROWS]
+
+                self.bench("search", entries, search, query_length = length)
+
+            counter = count()
+            added = []
+
+            def add():
+                i = next(counter)
+                added.append(controller.add_entry(f"bench.{i}", "bench.example.com", "password"))
+
+            self.bench("add_entry", entries, add)
+
+            record_id = controller.add_entry("edited", "edited.example.com", "password")
+
+            def edit():
+                controller.edit_entry(record_id, "edited", "edited.example.com", "password")
+
+            self.bench("edit_entry", entries, edit)
+
+            # delete what add_entry added
+            deleted = iter(added)
+
+            def delete():
+                controller.delete_entry(next(deleted))
+
+            self.bench("delete_entry", entries, delete)
+
+            record_id = table.get_record_id(*synthetic_entry(entries // 2))
+
+            def get_password():
+                # decrypting is what is measured, not the password cache
+                controller.password_cache.clear()
+                controller.get_password_at(record_id)
+
+            self.bench("get_password_at", entries, get_password)
+
+    def to_json(self) -> dict:
+        try:
+            from importlib.metadata import version
+            texpass_version = version("texpass")
+        except Exception:
+            texpass_version = "unknown"
+
+        return {
+            "texpass": texpass_version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "results": self.results,
+        }
+
+
+def main():
+    parser = ArgumentParser(prog="texpass-bench", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="vault sizes, e.g. 1000 1000000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--query", default="mail12.example.com alex")
+    parser.add_argument("-o", "--output", default="-", help="file to write JSON results to, - for stdout (default)")
+    args = parser.parse_args()
+
+    suite = Suite(args.repeat)
+
+    for entries in args.sizes:
+        suite.run_vault(entries, args.query)
+
+    result = json.dumps(suite.to_json(), indent=2)
+
+    if args.output == "-":
+        print(result)
+    else:
+        with open(args.output, "w") as file:
+            file.write(result + "\n")
+
+
+if __name__ == "__main__":
+    main()
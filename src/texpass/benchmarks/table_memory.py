@@ -0,0 +1,67 @@
+"""
+Memory held per entry by the internal table, with tuple rows as it used to be and with columns
+
+Counts bytes still allocated after populating, including the website and username strings kept.
+Run with `python -m texpass.benchmarks.table_memory`
+"""
+import gc
+import tracemalloc
+from argparse import ArgumentParser
+
+from texpass.model.table import Table
+from texpass.benchmarks.vault import synthetic_entries
+
+
+def tuple_rows(records):
+    """
+    Rows as Table kept them before: a tuple per row by ID, and an ID per (website, username)
+    """
+    rows = {}
+    entries = {}
+
+    for record_id, website, username in records:
+        rows[record_id] = (record_id, website, username)
+        entries[(website, username)] = record_id
+
+    return rows, entries
+
+
+def columns(records):
+    table = Table()
+    table.populate_table(records)
+
+    return table
+
+
+def measure(build, entries: int) -> float:
+    """
+    Bytes per entry held by what build makes from a synthetic vault
+    """
+    gc.collect()
+    tracemalloc.start()
+
+    # records are made while tracing, so only the strings build keeps are counted
+    held = build((i, *entry) for i, entry in enumerate(synthetic_entries(entries), 1))
+
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del held
+    return size / entries
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    for entries in args.sizes:
+        print(f"{entries} entries")
+
+        for label, build in [("tuple rows", tuple_rows), ("columns", columns)]:
+            print(f"{label:40} {measure(build, entries):10.1f} bytes per entry")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Time to show a search result in MyTable, rebuilding every row versus applying a row diff
+
+Run with `python -m texpass.benchmarks.table_render`
+"""
+import asyncio
+from argparse import ArgumentParser
+from time import perf_counter
+
+from textual.app import App
+
+from texpass.controller.table_controller import TableController
+from texpass.widgets.data_table import MyTable
+from texpass.benchmarks.vault import temporary_vault, report
+from texpass.benchmarks.search import keystrokes
+
+
+class TableApp(App):
+    def __init__(self, controller: TableController):
+        self.controller = controller
+        super().__init__()
+
+    def compose(self):
+        yield MyTable(self.controller)
+
+
+def rebuild(table: MyTable, records: list):
+    """What the table did before: clear and add every row again"""
+    table.clear()
+
+    for record, key in records:
+        table.add_row(*record, key = key)
+
+
+async def measure(controller: TableController, queries: list[str]) -> dict[str, list[float]]:
+    app = TableApp(controller)
+    durations = {"rebuild": [], "diff": []}
+
+    async with app.run_test() as pilot:
+        table = app.query_one(MyTable)
+        await pilot.pause()
+
+        results = [list(controller.generate_fuzzied_rows(query)) for query in queries]
+        everything = list(controller.generate_rows())
+
+        for label, apply in [("rebuild", rebuild), ("diff", MyTable.show_rows)]:
+            apply(table, everything)
+            await pilot.pause()
+
+            for records in results:
+                start = perf_counter()
+                apply(table, records)
+                # let the table measure its new rows
+                await pilot.pause()
+                durations[label].append((perf_counter() - start) * 1000)
+
+    return durations
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=50_000)
+    parser.add_argument("--query", default="mail12.example")
+    args = parser.parse_args()
+
+    with temporary_vault(args.entries) as account:
+        controller = TableController(account)
+        queries = keystrokes(args.query)
+
+        print(f"{args.entries} rows, typing and backspacing {args.query!r}")
+        durations = asyncio.run(measure(controller, queries))
+
+    for label, values in durations.items():
+        report(f"render per search ({label})", values)
+
+
+if __name__ == "__main__":
+    main()
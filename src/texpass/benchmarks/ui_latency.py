@@ -0,0 +1,191 @@
+"""
+Latency of interactions with the app, driven headlessly through login, search, paging and entry changes
+
+Every interaction is timed from the input until the app has repainted with its result.
+Exits with status 1 if the p95 of any interaction is over --max-p95-ms.
+Run with `python -m texpass.benchmarks.ui_latency`
+"""
+import sys
+import json
+import asyncio
+from argparse import ArgumentParser
+from time import perf_counter
+
+from texpass.app import MainApp
+from texpass.widgets.data_table import MyTable
+from texpass.benchmarks.vault import temporary_vault, BENCH_USERNAME, BENCH_PASSWORD
+from texpass.benchmarks.suite import summarise
+
+TERMINAL_SIZE = (120, 40)
+RESIZED_TERMINAL_SIZE = (160, 50)
+
+# seconds to wait for an interaction before giving up
+TIMEOUT = 120
+
+
+class Session:
+    """
+    Drives one app through the interactions, collecting their latencies in milliseconds
+    """
+    def __init__(self, app: MainApp, pilot):
+        self.app = app
+        self.pilot = pilot
+        self.timings: dict[str, list[float]] = {}
+
+    async def wait_for(self, condition):
+        """
+        Wait until condition returns True, then until the app is idle again
+        """
+        deadline = perf_counter() + TIMEOUT
+
+        while not condition():
+            if perf_counter() > deadline:
+                raise TimeoutError("Interaction did not finish")
+
+            await asyncio.sleep(0.001)
+
+        await self.pilot.pause()
+
+    async def timed(self, name: str, action, condition = lambda: True):
+        """
+        Run the action coroutine, and time it until condition holds and the app has repainted
+        """
+        start = perf_counter()
+        await action()
+        await self.wait_for(condition)
+        self.timings.setdefault(name, []).append((perf_counter() - start) * 1000)
+
+    def screen_is(self, name: str):
+        return lambda: type(self.app.screen).__name__ == name
+
+    @property
+    def table(self) -> MyTable:
+        return self.app.screen.query_one(MyTable)
+
+    async def log_in(self):
+        await self.wait_for(self.screen_is("LoginScreen"))
+        self.app.screen.query_one("#username").value = BENCH_USERNAME
+        self.app.screen.query_one("#inp_password").value = BENCH_PASSWORD
+
+        await self.timed("unlock", lambda: self.pilot.click("#login_button"), self.screen_is("TableScreen"))
+        await self.timed("table first paint", self.pilot.pause, lambda: self.table.row_count > 0)
+
+    async def search(self, query: str):
+        """
+        Type query one character at a time, then backspace it, waiting for each result to be shown
+        """
+        for end in range(1, len(query) + 1):
+            await self.timed(
+                "search keystroke", lambda: self.pilot.press(query[end - 1]),
+                lambda: self.table.shown_query == query[:end]
+            )
+
+        for end in range(len(query) - 1, -1, -1):
+            await self.timed(
+                "search backspace", lambda: self.pilot.press("backspace"),
+                lambda: self.table.shown_query == query[:end]
+            )
+
+    async def page(self, pages: int):
+        self.table.focus()
+        await self.pilot.pause()
+
+        for _ in range(pages):
+            await self.timed("page_down", lambda: self.pilot.press("right"))
+
+        for _ in range(pages):
+            await self.timed("page_up", lambda: self.pilot.press("left"))
+
+    async def add_edit_delete(self, count: int):
+        for i in range(count):
+            await self.pilot.press("ctrl+n")
+            await self.wait_for(self.screen_is("NewEntryScreen"))
+            self.app.screen.query_one("#usname").value = f"latency.{i}"
+            self.app.screen.query_one("#webs").value = "latency.example.com"
+            await self.timed("add entry", lambda: self.pilot.click(".submit"), self.screen_is("TableScreen"))
+
+            # the added entry is under the cursor
+            await self.pilot.press("ctrl+e")
+            await self.wait_for(self.screen_is("EditEntryScreen"))
+            self.app.screen.query_one("#edited_web").value = "latency.example.org"
+            await self.timed("edit entry", lambda: self.pilot.click(".submit"), self.screen_is("TableScreen"))
+
+            await self.pilot.press("ctrl+d")
+            await self.wait_for(self.screen_is("ConfirmScreen"))
+            await self.timed("delete entry", lambda: self.pilot.click("#delete"), self.screen_is("TableScreen"))
+
+    async def resize(self, name: str, count: int):
+        for i in range(count):
+            size = RESIZED_TERMINAL_SIZE if i % 2 == 0 else TERMINAL_SIZE
+            await self.timed(name, lambda: self.pilot.resize_terminal(*size))
+
+
+async def run_session(args) -> dict[str, list[float]]:
+    app = MainApp()
+
+    async with app.run_test(size = TERMINAL_SIZE) as pilot:
+        session = Session(app, pilot)
+
+        for i in range(args.logins):
+            await session.log_in()
+
+            if i < args.logins - 1:
+                await pilot.press("escape")
+
+        await session.search(args.query)
+        await session.page(args.pages)
+        await session.add_edit_delete(args.changes)
+        await session.resize("resize", args.resizes)
+
+        # with a query most entries match, the table holds far more rows
+        await session.timed(
+            "broad search", lambda: pilot.press(*args.broad_query),
+            lambda: session.table.shown_query == args.broad_query
+        )
+        await session.resize("resize (broad search shown)", args.resizes)
+
+        return session.timings
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--query", default="mail12alex")
+    parser.add_argument("--broad-query", default="a")
+    parser.add_argument("--logins", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--changes", type=int, default=5)
+    parser.add_argument("--resizes", type=int, default=6)
+    parser.add_argument("--max-p95-ms", type=float, default=None)
+    parser.add_argument("-o", "--output", default=None, help="file to write JSON results to")
+    args = parser.parse_args()
+
+    results = []
+
+    for entries in args.sizes:
+        with temporary_vault(entries):
+            timings = asyncio.run(run_session(args))
+
+        print(f"{entries} entries")
+
+        for name, durations in timings.items():
+            summary = summarise(durations)
+            results.append({"name": name, "entries": entries, "count": len(durations), "ms": summary})
+            print(f"{name:<40} p50 {summary['p50']:10.3f} ms   p95 {summary['p95']:10.3f} ms   max {summary['max']:10.3f} ms")
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            file.write(json.dumps(results, indent=2) + "\n")
+
+    if args.max_p95_ms is not None:
+        slow = [result for result in results if result["ms"]["p95"] > args.max_p95_ms]
+
+        for result in slow:
+            print(f"{result['name']} at {result['entries']} entries: p95 {result['ms']['p95']:.1f} ms, over {args.max_p95_ms} ms")
+
+        if slow:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Event loop responsiveness while logging in, driven headlessly
+
+Exits with status 1 if the event loop stalls for longer than --max-lag-ms during unlock.
+Run with `python -m texpass.benchmarks.unlock`
+"""
+import asyncio
+from argparse import ArgumentParser
+from time import perf_counter
+from statistics import quantiles
+
+from texpass.app import MainApp
+from texpass.benchmarks.vault import temporary_vault, BENCH_USERNAME, BENCH_PASSWORD
+
+# how often the probe task asks to be woken up
+PROBE_INTERVAL = 0.005
+
+
+async def measure_unlock() -> tuple[float, list[float]]:
+    """
+    Log in through the login screen while a probe task measures how late the event loop wakes it
+
+    Returns time taken to reach the table screen and the probe lags, both in milliseconds
+    """
+    app = MainApp()
+    lags = []
+
+    async with app.run_test() as pilot:
+        await pilot.pause()
+        app.screen.query_one("#username").value = BENCH_USERNAME
+        app.screen.query_one("#inp_password").value = BENCH_PASSWORD
+
+        unlocked = False
+
+        async def probe():
+            while not unlocked:
+                start = perf_counter()
+                await asyncio.sleep(PROBE_INTERVAL)
+                lags.append((perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+        probe_task = asyncio.create_task(probe())
+
+        start = perf_counter()
+        await pilot.click("#login_button")
+        while type(app.screen).__name__ != "TableScreen":
+            await asyncio.sleep(PROBE_INTERVAL)
+        unlock_time = (perf_counter() - start) * 1000
+
+        unlocked = True
+        await probe_task
+
+    return unlock_time, lags
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-lag-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    with temporary_vault(0):
+        unlock_time, lags = asyncio.run(measure_unlock())
+
+    p95 = quantiles(lags, n=20)[-1] if len(lags) > 1 else lags[0]
+    print(f"unlock took {unlock_time:.1f} ms, {len(lags)} probes")
+    print(f"event loop lag: p95 {p95:.2f} ms, max {max(lags):.2f} ms")
+
+    if max(lags) > args.max_lag_ms:
+        print(f"event loop stalled for longer than {args.max_lag_ms} ms")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
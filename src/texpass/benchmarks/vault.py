@@ -0,0 +1,92 @@
+"""
+Synthetic vaults for benchmarking
+"""
+import os
+from tempfile import TemporaryDirectory
+from contextlib import contextmanager
+from statistics import median
+from time import perf_counter
+
+from texpass.setup_app import setup_database
+from texpass.helper.account import Account
+from texpass.helper.storage import close_storage
+
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench-password"
+BENCH_SALT = "benchsaltbenchsa"
+
+WEBSITE_WORDS = ["mail", "bank", "shop", "news", "cloud", "photo", "game", "music", "work", "forum", "travel", "stream"]
+USER_WORDS = ["alex", "sam", "kim", "jo", "lee", "max", "ari", "eli"]
+DOMAINS = ["com", "org", "net", "io"]
+
+
+def synthetic_entry(index: int, seed: int = 0) -> tuple[str, str]:
+    """
+    (website, username) of entry number index of a synthetic vault
+
+    Deterministic, and unique for every index
+    """
+    website = f"{WEBSITE_WORDS[(index + seed) % len(WEBSITE_WORDS)]}{index % 1000}.example.{DOMAINS[(index // 7 + seed) % len(DOMAINS)]}"
+    username = f"{USER_WORDS[(index * 3 + seed) % len(USER_WORDS)]}.{index}"
+
+    return website, username
+
+
+def synthetic_entries(entries: int, seed: int = 0):
+    for index in range(entries):
+        yield synthetic_entry(index, seed)
+
+
+@contextmanager
+def temporary_vault(entries: int, seed: int = 0):
+    """
+    Create a database in a temporary working directory with one account holding `entries` synthetic rows
+
+    Yields the Account, with no session key derived yet
+    """
+    old_cwd = os.getcwd()
+
+    with TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            setup_database()
+            account = Account.from_register(BENCH_USERNAME, BENCH_PASSWORD, BENCH_SALT)
+            # every row gets the same token, encrypting each one would dominate setup time
+            token = account.get_key().encrypt(b"password").decode()
+
+            with account.storage.transaction() as con:
+                con.executemany(
+                    "INSERT INTO passwords (account_name, number, username, website, encrypted_password) \
+                        VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (BENCH_USERNAME, number, username, website, token)
+                        for number, (website, username) in enumerate(synthetic_entries(entries, seed), 1)
+                    )
+                )
+
+            account.lock()
+            # deriving the key cleared it, benchmarks derive it again
+            account.password = BENCH_PASSWORD
+            yield account
+        finally:
+            # the shared connection points into the temporary directory
+            close_storage()
+            os.chdir(old_cwd)
+
+
+def time_call(func, repeat: int) -> list[float]:
+    """
+    Call func `repeat` times, returning the durations in milliseconds
+    """
+    durations = []
+
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        durations.append((perf_counter() - start) * 1000)
+
+    return durations
+
+
+def report(label: str, durations: list[float]):
+    print(f"{label:<40} median {median(durations):10.3f} ms   max {max(durations):10.3f} ms")
@@ -0,0 +1,340 @@
+"""
+Command line interface for working with a vault without the TUI
+
+Commands import only what they need, and never Textual, so they start quickly
+"""
+import os
+import sys
+from argparse import ArgumentParser
+from getpass import getpass
+
+from texpass.helper.importer import FORMATS as IMPORT_FORMATS
+from texpass.helper.exporter import FORMATS as EXPORT_FORMATS
+
+ACCOUNT_ENV = "TEXPASS_ACCOUNT"
+"""environment variable with the default account for commands"""
+
+
+def read_secret(prompt: str) -> str:
+    """
+    Prompt for a secret without echo, or read a line from stdin if it is piped in
+    """
+    if sys.stdin.isatty():
+        return getpass(prompt)
+
+    return sys.stdin.readline().rstrip("\n")
+
+
+def log_in(username: str, password: str = None):
+    """
+    Prompt for the master password, if not given, and log in. Exits with an error message on failure
+    """
+    from texpass.controller.login import LoginController
+
+    if password is None:
+        password = read_secret(f"Master password for {username}: ")
+
+    status = LoginController().log_in(username, password)
+
+    if not status.status:
+        sys.exit(status.message)
+
+    return status.account
+
+
+def agent_request(args, op: str, **fields):
+    """
+    Result of a request to a running agent, or None if there is no agent to ask
+
+    If the account is locked in the agent, it is unlocked there first, so later commands skip key derivation.
+    Exits with an error message if the agent refuses the request
+    """
+    if args.no_agent:
+        return None
+
+    from texpass.helper.agent_client import AgentClient
+    from texpass.exceptions.exceptions import AgentUnavailable, AgentLocked, AgentError
+
+    client = AgentClient()
+
+    try:
+        try:
+            return client.request(op, account=args.account, **fields)
+        except AgentLocked:
+            client.request("unlock", account=args.account, password=read_secret(f"Master password for {args.account}: "))
+            return client.request(op, account=args.account, **fields)
+    except AgentUnavailable:
+        return None
+    except AgentError as error:
+        sys.exit(str(error))
+
+
+def find_entry(controller, website: str, username: str = None) -> int:
+    """
+    ID of the entry to use for website. Exits with an error message if there is no single one
+    """
+    from texpass.exceptions.exceptions import InvalidArguments
+
+    try:
+        return controller.find_entry(website, username)
+    except InvalidArguments as error:
+        sys.exit(str(error))
+
+
+def get_command(args) -> int:
+    from texpass.controller.table_controller import TableController
+
+    password = agent_request(args, "get", website=args.website, user=args.user)
+
+    if password is None:
+        controller = TableController(log_in(args.account))
+        password = controller.get_password_at(find_entry(controller, args.website, args.user))
+
+    print(password)
+
+    return 0
+
+
+def copy_command(args) -> int:
+    from texpass.controller.table_controller import TableController
+
+    message = agent_request(args, "copy", website=args.website, user=args.user)
+
+    if message is None:
+        controller = TableController(log_in(args.account))
+        controller.copy_password_at(find_entry(controller, args.website, args.user))
+        message = "Password has been copied"
+
+    print(message, file=sys.stderr)
+
+    return 0
+
+
+def list_command(args) -> int:
+    from texpass.model.table import match_terms
+
+    if args.search:
+        records = agent_request(args, "search", query=args.search)
+    else:
+        records = agent_request(args, "list")
+
+    if records is None:
+        account = log_in(args.account)
+        records = match_terms(account.get_all_records(), args.search or "")
+
+    for website, username in records:
+        print(f"{website}\t{username}")
+
+    return 0
+
+
+def read_entry_password(args) -> str:
+    password = read_secret(f"Password for {args.username} at {args.website}: ")
+
+    # only ask twice if someone is typing it
+    if sys.stdin.isatty() and getpass("Password again: ") != password:
+        sys.exit("Passwords don't match")
+
+    return password
+
+
+def add_command(args) -> int:
+    from texpass.controller.table_controller import TableController
+    from texpass.exceptions.exceptions import EntryAlreadyExists
+
+    # unlock first, so the master password is always asked for before the entry password
+    if agent_request(args, "status") is not None:
+        password = None if args.generate else read_entry_password(args)
+        message = agent_request(
+            args, "add",
+            website=args.website, username=args.username, password=password, generate=args.generate
+        )
+        print(message, file=sys.stderr)
+
+        return 0
+
+    controller = TableController(log_in(args.account))
+    password = controller.make_password() if args.generate else read_entry_password(args)
+
+    try:
+        controller.add_entry(args.username, args.website, password)
+    except EntryAlreadyExists:
+        sys.exit("Entry already exists")
+
+    print("Entry added", file=sys.stderr)
+
+    return 0
+
+
+def lock_command(args) -> int:
+    from texpass.helper.agent_client import AgentClient
+    from texpass.exceptions.exceptions import AgentUnavailable
+
+    if not args.all and args.account is None:
+        sys.exit("Give an account to lock with --account, or lock every account with --all")
+
+    fields = {} if args.all else {"account": args.account}
+
+    try:
+        locked = AgentClient().request("lock", **fields)
+    except AgentUnavailable:
+        sys.exit("No agent is running")
+
+    print(f"Locked {locked} account{'s' if locked != 1 else ''}", file=sys.stderr)
+
+    return 0
+
+
+def import_command(args) -> int:
+    from texpass.controller.table_controller import TableController
+    from texpass.helper.importer import read_entries
+
+    from cryptography.fernet import InvalidToken
+
+    format_ = args.format
+    if format_ is None:
+        format_ = "json" if args.file.lower().endswith((".json", ".jsonl")) else "csv"
+
+    controller = TableController(log_in(args.account))
+
+    backup_password = None
+    if format_ == "backup":
+        backup_password = getpass("Master password the backup was made with: ")
+
+    stream = sys.stdin if args.file == "-" else open(args.file, newline="", encoding="utf-8")
+    try:
+        entries = read_entries(stream, format_, backup_password)
+        report = controller.bulk_import(entries, batch_size = args.batch_size)
+    except InvalidToken:
+        sys.exit("Wrong password for backup")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    print(f"Imported {report.imported} entries")
+
+    if report.duplicates:
+        print(f"Skipped {len(report.duplicates)} duplicate entries:")
+        for website, username in report.duplicates:
+            print(f"  {website}  {username}")
+
+    if report.invalid:
+        print(f"Skipped {report.invalid} entries without a website or username")
+
+    return 0
+
+
+def export_command(args) -> int:
+    from texpass.controller.table_controller import TableController
+
+    controller = TableController(log_in(args.account))
+
+    stream = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        count = controller.export(stream, args.format, batch_size = args.batch_size)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    # stdout may be piped, keep it for the export itself
+    print(f"Exported {count} entries", file=sys.stderr)
+
+    return 0
+
+
+def passwd_command(args) -> int:
+    from texpass.controller.change_password import ChangePasswordController
+
+    # the account does not keep the master password once logged in
+    current_password = read_secret(f"Master password for {args.account}: ")
+    account = log_in(args.account, current_password)
+
+    new_password = getpass("New master password: ")
+    if new_password.strip() == "":
+        sys.exit("Please fill password field")
+    if getpass("New master password again: ") != new_password:
+        sys.exit("Passwords don't match")
+
+    controller = ChangePasswordController(account)
+
+    status = controller.change_password(current_password, new_password)
+    print(status.message)
+    if not status.status:
+        return 1
+
+    status = controller.verify()
+    print(status.message)
+
+    return 0 if status.status else 1
+
+
+def make_parser() -> ArgumentParser:
+    parser = ArgumentParser(prog="texpass", description="Password manager with Textual user interface. Run without a command for the TUI")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # every command works on one account
+    account_parser = ArgumentParser(add_help=False)
+    account_parser.add_argument(
+        "-a", "--account",
+        default=os.environ.get(ACCOUNT_ENV), required=ACCOUNT_ENV not in os.environ,
+        help=f"account to use, defaults to ${ACCOUNT_ENV}"
+    )
+
+    # commands that can be served by a running agent
+    agent_parser = ArgumentParser(add_help=False, parents=[account_parser])
+    agent_parser.add_argument("--no-agent", action="store_true", help="derive the key in this process even if an agent is running")
+
+    get_parser = subparsers.add_parser("get", parents=[agent_parser], help="print password of an entry")
+    get_parser.add_argument("website")
+    get_parser.add_argument("-u", "--user", help="username of the entry, if the website has several")
+    get_parser.set_defaults(func=get_command)
+
+    copy_parser = subparsers.add_parser("copy", parents=[agent_parser], help="copy password of an entry to the clipboard")
+    copy_parser.add_argument("website")
+    copy_parser.add_argument("-u", "--user", help="username of the entry, if the website has several")
+    copy_parser.set_defaults(func=copy_command)
+
+    list_parser = subparsers.add_parser("list", parents=[agent_parser], help="list websites and usernames of entries")
+    list_parser.add_argument("-s", "--search", help="only entries containing every word of this")
+    list_parser.set_defaults(func=list_command)
+
+    add_parser = subparsers.add_parser("add", parents=[agent_parser], help="add an entry")
+    add_parser.add_argument("website")
+    add_parser.add_argument("username")
+    add_parser.add_argument("-g", "--generate", action="store_true", help="generate a random password instead of asking for one")
+    add_parser.set_defaults(func=add_command)
+
+    lock_parser = subparsers.add_parser("lock", help="lock an account in the running agent")
+    lock_parser.add_argument("-a", "--account", default=os.environ.get(ACCOUNT_ENV), help=f"account to lock, defaults to ${ACCOUNT_ENV}")
+    lock_parser.add_argument("--all", action="store_true", help="lock every account")
+    lock_parser.set_defaults(func=lock_command)
+
+    import_parser = subparsers.add_parser("import", parents=[account_parser], help="import entries from a CSV or JSON export")
+    import_parser.add_argument("file", help="file to import, - for stdin")
+    import_parser.add_argument("-f", "--format", choices=IMPORT_FORMATS, help="defaults to the file extension, else csv")
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    import_parser.set_defaults(func=import_command)
+
+    export_parser = subparsers.add_parser("export", parents=[account_parser], help="export all entries of an account")
+    export_parser.add_argument("-f", "--format", choices=EXPORT_FORMATS, default="csv")
+    export_parser.add_argument("-o", "--output", default="-", help="file to write to, - for stdout (default)")
+    export_parser.add_argument("--batch-size", type=int, default=1000)
+    export_parser.set_defaults(func=export_command)
+
+    passwd_parser = subparsers.add_parser("passwd", parents=[account_parser], help="change master password of an account")
+    passwd_parser.set_defaults(func=passwd_command)
+
+    return parser
+
+
+def main(argv: list[str] = None) -> int:
+    from texpass import setup_app
+    from texpass.helper.storage import close_storage
+
+    args = make_parser().parse_args(argv)
+
+    setup_app.setup_database()
+    try:
+        return args.func(args)
+    finally:
+        close_storage()
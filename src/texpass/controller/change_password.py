@@ -0,0 +1,32 @@
+from texpass.helper.account import Account
+from texpass.helper.kdf import calibrated_params
+from texpass.helper.status import Status
+from texpass.controller.register import RegisterController
+
+
+class ChangePasswordController:
+    def __init__(self, account: Account):
+        self.account = account
+
+    def change_password(self, current_password: str, new_password: str) -> Status:
+        """
+        Change master password of the account, re-encrypting all of its entries
+        """
+        if not self.account.verify_password(current_password):
+            return Status(False, message="Wrong Password")
+
+        # a new password also gets parameters calibrated for this machine
+        count = self.account.change_master_password(new_password, RegisterController().make_salt(), kdf = calibrated_params())
+
+        return Status(True, account=self.account, message=f"Master password changed, {count} entries re-encrypted")
+
+    def verify(self) -> Status:
+        """
+        Check that every entry can be decrypted with the current key
+        """
+        failed = self.account.verify_entries()
+
+        if failed:
+            return Status(False, message=f"{len(failed)} entries could not be decrypted")
+        else:
+            return Status(True, message="All entries decrypt with the current key")
@@ -1,12 +1,17 @@
-from texpass.helper.account import Account
 from texpass.helper.status import Status
 from texpass.exceptions.exceptions import UsernameDoesNotExist, WrongPassword
 
 
 class LoginController:
-    def log_in(self, username: str, password: str) -> Status:
+    def log_in(self, username: str, password: str, derive_key: bool = True) -> Status:
+        """
+        Log in, deriving the key while verifying the password if derive_key, see `Account.from_login`
+        """
+        # argon2 and cryptography are only loaded once they are needed, after the login screen is shown
+        from texpass.helper.account import Account
+
         try:
-            account = Account.from_login(username, password)
+            account = Account.from_login(username, password, derive_key = derive_key)
         except UsernameDoesNotExist:
             return Status(False, message="Username does not exist")
         except WrongPassword:
@@ -1,17 +1,20 @@
 from secrets import choice
 import string
 
-from texpass.helper.account import Account
 from texpass.helper.status import Status
-from texpass.exceptions.exceptions import UsernameAlreadyExists
+from texpass.exceptions.exceptions import UsernameAlreadyExists, RegisterCancelled
 
 
 class RegisterController:
-    def register(self, username: str, password: str) -> Status:
+    def register(self, username: str, password: str, is_cancelled = None) -> Status:
+        from texpass.helper.account import Account
+
         try:
-            account = Account.from_register(username, password, self.make_salt())
+            account = Account.from_register(username, password, self.make_salt(), is_cancelled = is_cancelled)
         except UsernameAlreadyExists:
             return Status(False, message="Username already exists")
+        except RegisterCancelled:
+            return Status(False, message="Registering cancelled")
         else:
             return Status(True, account=account, message="Registering and logging you in...")
 
@@ -1,5 +1,9 @@
+from typing import TYPE_CHECKING
+
 from textual.app import App
-from texpass.helper.account import Account
+
+if TYPE_CHECKING:
+    from texpass.helper.account import Account
 
 
 class ScreenController:
@@ -17,7 +21,7 @@ class ScreenController:
 
         self.app.switch_screen(RegisterScreen(self))
 
-    def to_table(self, account: Account):
+    def to_table(self, account: "Account"):
         """
         Switch to table (main) screen
 
@@ -38,17 +42,17 @@ class ScreenController:
 
         self.app.push_screen(LoginScreen(LoginController(), self))
 
-    def push_delete(self):
+    def push_delete(self, logout):
         """
         Pushes DeleteAccountScreen
 
-        If successful, switches to login screen
+        If successful, calls logout, which has to lock the session and switch to login screen
         """
         from texpass.screens.delete_account import DeleteAccountScreen, DeleteController
         
-        def logout(status: bool):
+        def deleted(status: bool):
             if status:
                 self.account = None
-                self.to_login()
+                logout()
 
-        self.app.push_screen(DeleteAccountScreen(DeleteController(self.account)), logout)
+        self.app.push_screen(DeleteAccountScreen(DeleteController(self.account)), deleted)
@@ -1,22 +1,108 @@
+import os
 from secrets import choice
 from string import printable
-from pyperclip import copy
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 
-from texpass.model.table import Table, Columns
+from texpass.model.table import Table, Columns, IncrementalSearch, IndexedSearch
+from texpass.model.scoring import SearchResult, make_scorer
+from texpass.model.record_window import RecordWindow
 from texpass.helper.account import Account
+from texpass.helper.importer import ImportReport, batched
+from texpass.helper import exporter
+from texpass.helper.password_cache import PasswordCache
+from texpass.helper.instrument import traced, span
+from texpass.helper.kdf import available_cores
+from texpass.exceptions.exceptions import InvalidArguments
+
+
+SEARCH_BACKEND_ENV = "TEXPASS_SEARCH"
+"""environment variable choosing the search backend"""
+
+SEARCH_BACKENDS = ("memory", "fts")
+
+SCORER_ENV = "TEXPASS_SCORER"
+"""environment variable choosing how search results are matched and scored"""
+
+PARALLEL_SEARCH_ROWS_ENV = "TEXPASS_PARALLEL_SEARCH_ROWS"
+"""environment variable setting the rows above which the in-memory search is split across processes"""
+DEFAULT_PARALLEL_SEARCH_ROWS = 200_000
+MAX_SEARCH_WORKERS = 8
 
 
 class TableController:
-    def __init__(self, account: Account):
+    def __init__(self, account: Account, search_backend: str = None, scorer: str = None):
+        """
+        :param str search_backend: "memory" scores every loaded row, "fts" narrows candidates with 
+            an SQLite full text index first. Defaults to $TEXPASS_SEARCH, else "memory".
+            Falls back to "memory" if SQLite has no FTS5
+        :param str scorer: "fuzzy" matches the characters of the query in order, 
+            "substring" matches its words as typed and is faster. Defaults to $TEXPASS_SCORER, else "fuzzy"
+
+        With more than one core, in-memory searches of at least $TEXPASS_PARALLEL_SEARCH_ROWS rows
+        (200000 by default) are split across worker processes, and return the best 1000 rows
+        """
         self.account = account
         self.table = Table()
+        self.password_cache = PasswordCache()
+
+        self.window = RecordWindow(account.get_records_page)
+        """rows shown when not searching, loaded a page at a time"""
+        self.table_loaded = False
+        """True once every row is in the internal table, which the in-memory search needs"""
+        self._table_lock = Lock()
+
+        if search_backend is None:
+            search_backend = os.environ.get(SEARCH_BACKEND_ENV, "memory")
+        if search_backend not in SEARCH_BACKENDS:
+            raise ValueError(f"Unknown search backend {search_backend}")
+
+        scorer = make_scorer(scorer if scorer is not None else os.environ.get(SCORER_ENV, "fuzzy"))
+        self.search_backend = "memory"
+        self.table.search = IncrementalSearch(scorer = scorer)
+
+        if search_backend == "fts":
+            from texpass.setup_app import has_search_index
+
+            if has_search_index(account.storage.path):
+                self.search_backend = "fts"
+                self.table.search = IndexedSearch(account.search_candidates, scorer = scorer)
+
+        # with one core, worker processes would only add their overhead
+        workers = min(available_cores(), MAX_SEARCH_WORKERS)
+        if self.search_backend == "memory" and workers > 1:
+            from texpass.model.sharded_search import ShardedSearch
+
+            self.table.parallel_search = ShardedSearch(workers, scorer = scorer)
+            self.table.parallel_search_rows = int(os.environ.get(PARALLEL_SEARCH_ROWS_ENV, DEFAULT_PARALLEL_SEARCH_ROWS))
 
     def get_column_ordering(self) -> Columns:
         return self.table.columns
 
     def populate_internal_table(self):
-        records = self.account.get_all_records()
-        self.table.populate_table(records)
+        with self._table_lock:
+            records = self.account.get_all_records()
+            self.table.populate_table(records)
+            self.table_loaded = True
+
+    def ensure_table_loaded(self):
+        """
+        Populate internal table if it has not been yet. Can be called from a worker thread
+        """
+        if not self.table_loaded:
+            self.populate_internal_table()
+
+    def display_rows(self, rows):
+        """
+        Generator of (row, key) to show rows in the UI table
+
+        Rows show the number of their entry in place of its ID, see `Account.get_entry_numbers`. Key being the ID of the row
+        """
+        rows = list(rows)
+        numbers = self.account.get_entry_numbers(row[0] for row in rows)
+
+        for row in rows:
+            yield ((numbers.get(row[0]), *row[1:]), self.table.get_key(row))
 
     def generate_rows(self):
         """
@@ -24,20 +110,74 @@ class TableController:
 
         Key being the ID of the row
         """
-        generator = self.table.generator()
+        yield from self.display_rows(self.table.generator())
 
-        for row in generator:
-            yield (row, self.table.get_key(row))
+    def generate_window_rows(self):
+        """
+        Generator of (row, key) for the loaded rows of the window, in website order
+        """
+        yield from self.display_rows(self.window.rows)
 
-    def generate_fuzzied_rows(self, query: str):
+    def load_first_page(self):
+        self.window.load_first()
+
+    def load_next_page(self) -> int:
+        """
+        Load the next page of the window. Returns number of rows dropped from its start
+        """
+        return self.window.load_next()
+
+    def load_previous_page(self) -> int:
+        """
+        Load the previous page of the window. Returns number of rows added at its start
+        """
+        return self.window.load_previous()
+
+    def reload_window(self, record_id: int = None):
+        """
+        Load the rows of the window again after a change. If record_id is given, make sure its row is loaded
+        """
+        self.window.reload()
+
+        if record_id is not None and all(row[0] != record_id for row in self.window.rows):
+            record = self.account.get_record(record_id)
+
+            if record is not None:
+                self.window.load_around(record)
+
+    def get_entry_id(self, number: int) -> int:
         """
-        Generator for filling up table after fuzzy search
+        ID of the entry shown with this number, or None if there is none
+        """
+        return self.account.get_entry_id(number)
+
+    def search(self, query: str, is_cancelled = None) -> SearchResult:
+        """
+        Search every entry. Does not check if query is empty
+
+        The in-memory search loads every row on its first use, so call it from a worker
+
+        Raises SearchCancelled if is_cancelled is given and returns True during the search
+        """
+        if self.search_backend == "memory":
+            self.ensure_table_loaded()
 
-        Does not check if query is empty
+        return self.table.get_fuzzied_records(query, is_cancelled)
+
+    def generate_result_rows(self, result: SearchResult, stop: int = None):
+        """
+        Generator of (row, key) for the best stop rows of a search result, or all of them. Only those get ranked
         """
         # don't care about fuzzy score right now
-        for record, _ in self.table.get_fuzzied_records(query):
-            yield (record, self.table.get_key(record))
+        yield from self.display_rows(record for record, _ in result[:stop])
+
+    def generate_fuzzied_rows(self, query: str, is_cancelled = None, limit: int = None):
+        """
+        Generator for filling up table after fuzzy search, with the best limit rows or all of them
+
+        See `search`
+        """
+        yield from self.generate_result_rows(self.search(query, is_cancelled), limit)
 
     def make_password(self) -> str:
         """
@@ -45,6 +185,7 @@ class TableController:
         """
         return ''.join(choice(printable) for _ in range(30))
     
+    @traced("fernet.encrypt")
     def encrypt_password(self, password: str) -> bytes:
         """
         To be used when encrypting passwords to store within this account
@@ -56,20 +197,103 @@ class TableController:
         """
         Adds password entry for this account. Also adds it to internal table.
 
-        Returns ID of internal table record
+        Returns ID of the new entry, which is also its internal table ID
 
         Raises EntryAlreadyExists if username and website is not unique
         """
         encrypted = self.encrypt_password(plain_password)
-        self.account.add_entry(username, website, encrypted.decode())
-        id = self.table.add_record(website, username)
+        record_id = self.account.add_entry(username, website, encrypted.decode())
+
+        with self._table_lock:
+            if self.table_loaded:
+                self.table.add_record(record_id, website, username)
 
-        return id
+        return record_id
     
+    def bulk_import(self, entries, batch_size: int = 1000, workers: int = None) -> ImportReport:
+        """
+        Adds many password entries for this account. Also adds them to internal table,
+        which is loaded first if it has not been yet, as duplicates are found with it
+
+        entries is an iterable of (website, username, plain_password), consumed as a stream.
+        Passwords are encrypted in batches on a thread pool and everything is written in one transaction
+
+        Entries that already exist, or appear twice, are reported as duplicates and skipped
+        """
+        self.ensure_table_loaded()
+        report = ImportReport()
+        key = self.account.get_key()
+        added = []
+
+        def new_entries():
+            seen = set()
+
+            for website, username, plain_password in entries:
+                if website == "" or username == "":
+                    report.invalid += 1
+                elif (website, username) in seen or self.table.get_record_id(website, username) is not None:
+                    report.duplicates.append((website, username))
+                else:
+                    seen.add((website, username))
+                    yield website, username, plain_password
+
+        def encrypt(plain_password: str) -> str:
+            with span("fernet.encrypt"):
+                return key.encrypt(plain_password.encode()).decode()
+
+        def encrypted_entries():
+            with ThreadPoolExecutor(workers) as executor:
+                for batch in batched(new_entries(), batch_size):
+                    encrypted = executor.map(encrypt, [entry[2] for entry in batch])
+
+                    for (website, username, _), encrypted_password in zip(batch, encrypted):
+                        added.append((website, username))
+                        yield username, website, encrypted_password
+
+        record_ids = self.account.add_entries(encrypted_entries())
+
+        for record_id, (website, username) in zip(record_ids, added):
+            self.table.add_record(record_id, website, username)
+
+        report.imported = len(added)
+        return report
+
+    def generate_plain_entries(self, batch_size: int = 1000):
+        """
+        Generator of (website, username, plain_password) for every entry of this account
+
+        Reads and decrypts in batches, so memory use does not grow with the number of entries
+        """
+        key = self.account.get_key()
+
+        for batch in self.account.get_entry_batches(batch_size):
+            for website, username, encrypted_password in batch:
+                with span("fernet.decrypt"):
+                    plain_password = key.decrypt(encrypted_password).decode()
+
+                yield website, username, plain_password
+
+    def export(self, stream, format_: str, batch_size: int = 1000) -> int:
+        """
+        Write every entry of this account to a text stream, as csv, jsonl or an encrypted backup
+
+        Returns number of entries written
+        """
+        entries = self.generate_plain_entries(batch_size)
+
+        if format_ == "csv":
+            return exporter.write_csv(entries, stream)
+        elif format_ == "jsonl":
+            return exporter.write_jsonl(entries, stream)
+        elif format_ == "backup":
+            header = {"account": self.account.username, "salt": self.account.salt, **self.account.kdf.as_dict()}
+            return exporter.write_backup(entries, stream, self.account.get_key(), header, batch_size)
+        else:
+            raise ValueError(f"Unknown export format {format_}")
+
     def edit_entry(
             self, 
             record_id: int, 
-            old_username: str, old_website: str, 
             entry_username: str, entry_website: str, entry_password: str
         ):
         """
@@ -80,31 +304,89 @@ class TableController:
         Raises EntryAlreadyExists if username and website is not unique
         """
         encrypted = self.encrypt_password(entry_password)
-        self.account.edit_entry(old_username, old_website, entry_username, entry_website, encrypted.decode())
-        self.table.edit_record(record_id, entry_website, entry_username)
+        self.account.edit_entry(record_id, entry_username, entry_website, encrypted.decode())
+        with self._table_lock:
+            if self.table_loaded:
+                self.table.edit_record(record_id, entry_website, entry_username)
+
+        self.password_cache.invalidate(record_id)
     
-    def get_password_at(self, username: str, website: str):
+    def get_password_at(self, record_id: int):
+        """
+        Get raw password of the entry with this ID
+
+        Only to be used for viewing it. Recently decrypted passwords are served from the password cache
         """
-        Get raw password at specified website and username
+        password = self.password_cache.get(record_id)
 
-        Only to be used for viewing it
+        if password is None:
+            password = self.account.get_entry_password(record_id)
+            self.password_cache.put(record_id, password)
+
+        return password
+
+    def find_entry(self, website: str, username: str = None) -> int:
+        """
+        ID of the only entry for website, or of the one with username if it is given
+
+        Raises InvalidArguments if there is no such entry, or if website has several and username is not given
         """
-        return self.account.get_entry_password(username, website)
+        entries = self.account.get_website_entries(website)
+
+        if username is not None:
+            entries = [(record_id, entry_username) for record_id, entry_username in entries if entry_username == username]
+
+            if not entries:
+                raise InvalidArguments(f"No entry for {username} at {website}")
 
-    def copy_password_at(self, username: str, website: str):
+        if not entries:
+            raise InvalidArguments(f"No entry for {website}")
+        if len(entries) > 1:
+            usernames = ", ".join(entry_username for _, entry_username in entries)
+            raise InvalidArguments(f"Several entries for {website}, pick one with --user: {usernames}")
+
+        return entries[0][0]
+
+    def copy_password_at(self, record_id: int):
         """
-        Copy password with specified website and username
+        Copy password of the entry with this ID
         """
-        password = self.account.get_entry_password(username, website)
+        from pyperclip import copy
 
-        copy(password)
+        copy(self.get_password_at(record_id))
     
-    def delete_entry(self, username: str, website: str):
+    def delete_entry(self, record_id: int):
+        """
+        Deletes entry with this ID. Also removes it from internal table
+        """
+        self.account.delete_entry(record_id)
+        self.password_cache.invalidate(record_id)
+
+        with self._table_lock:
+            if self.table_loaded:
+                self.table.delete_record(record_id)
+
+    def is_idle(self) -> bool:
         """
-        Deletes entry for specified website and username
+        Check if the session has been idle for longer than its timeout
+        """
+        return self.account.is_idle()
+
+    def touch(self):
+        """
+        Mark the session as active
+        """
+        self.account.touch()
 
-        Updates internal table
+    def lock(self):
+        """
+        Wipe the session key of this account and cached passwords, and close its database connection.
+        Use when logging out
         """
-        self.account.delete_entry(username, website)
+        self.password_cache.clear()
+
+        if self.table.parallel_search is not None:
+            self.table.parallel_search.close()
 
-        self.populate_internal_table()
\ No newline at end of file
+        self.account.lock()
+        self.account.storage.close()
@@ -11,4 +11,19 @@ class WrongPassword(Exception):
     pass
 
 class InvalidArguments(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class SearchCancelled(Exception):
+    pass
+
+class RegisterCancelled(Exception):
+    pass
+
+class AgentUnavailable(Exception):
+    pass
+
+class AgentLocked(Exception):
+    pass
+
+class AgentError(Exception):
+    pass
@@ -1,177 +1,555 @@
 from argon2.low_level import hash_secret
-from argon2 import Type, PasswordHasher
-from argon2.exceptions import VerifyMismatchError
+from argon2 import Type
+from argon2.exceptions import VerifyMismatchError, VerificationError
 
-from sqlite3 import connect, IntegrityError
-from cryptography.fernet import Fernet
-from base64 import urlsafe_b64encode
+from sqlite3 import IntegrityError, Error as SQLiteError
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
 
 from texpass.exceptions.exceptions import *
+from texpass.helper.session_key import SessionKey, DEFAULT_IDLE_TIMEOUT
+from texpass.helper.kdf import KdfParams, LEGACY_PARAMS, calibrated_params
+from texpass.helper.storage import Storage, get_storage, PASSWORDS_DATABASE
+from texpass.helper.instrument import traced, span
 
-# TODO use some kind of config file to get name 
-PASSWORDS_DATABASE = "passwords.db"
+NEXT_NUMBER = "(SELECT COALESCE(MAX(number), 0) + 1 FROM passwords WHERE account_name = ?)"
+"""number of a new entry of an account, see `Account.get_entry_numbers`"""
+
+# IDs looked up per query, below SQLite's limit on parameters
+NUMBER_LOOKUP_BATCH = 500
 
 
 class Account:
-    def __init__(self, username: str = None, password: str = None, salt: str = None):
+    def __init__(
+            self, username: str = None, password: str = None, salt: str = None, 
+            storage: Storage = None, kdf: KdfParams = None
+        ):
         self.username = username
         self.password = password
+        """master password, cleared once the key is derived"""
         self.salt = salt
+        self.kdf = kdf if kdf is not None else LEGACY_PARAMS
+        """Argon2 parameters the login hash and key of this account are made with"""
+        self.session_key: SessionKey = None
+        self.storage = storage if storage is not None else get_storage()
+        self.password_hash: str = None
+        """login hash the key was made for, see `login_changed`"""
+        self.active_at = monotonic()
+        """when this account logged in or was last touched, see `is_idle`"""
 
+    @traced("account.get_hashed_password")
     def get_hashed_password(self) -> bytes:
         hashed_password = hash_secret(
             secret = self.password.encode(), 
             salt = self.salt.encode(), 
-            time_cost = 3,
-            memory_cost = 65536, 
-            parallelism = 4, hash_len = 30, 
+            time_cost = self.kdf.time_cost,
+            memory_cost = self.kdf.memory_cost, 
+            parallelism = self.kdf.parallelism, hash_len = 30, 
             type = Type.ID
         )
 
         return hashed_password[-32:]
     
+    @traced("account.get_all_records")
     def get_all_records(self) -> list[tuple]:
-        con = connect(PASSWORDS_DATABASE)
-
-        records = con.execute(
-            "SELECT website, username FROM passwords WHERE account_name = ?;",
+        """
+        (id, website, username) of every entry, in the order they were added
+        """
+        return self.storage.fetchall(
+            "SELECT id, website, username FROM passwords WHERE account_name = ? ORDER BY id;",
             (self.username,)
-        ).fetchall()
-        
-        con.close()
+        )
+
+    @traced("account.get_records_page")
+    def get_records_page(self, key: tuple, direction: str, limit: int) -> list[tuple]:
+        """
+        Up to limit (id, website, username) entries next to key, in (website, username, id) order
+
+        :param tuple key: (website, username, id) to page from. None starts from the first entry
+        :param str direction: "after" for entries after key, "from" to include key itself, "before" for entries before it
+        """
+        if key is None:
+            return self.storage.fetchall(
+                "SELECT id, website, username FROM passwords WHERE account_name = ? \
+                    ORDER BY website, username, id LIMIT ?;",
+                (self.username, limit)
+            )
+
+        if direction == "before":
+            # read backwards from key, then put back in order
+            return self.storage.fetchall(
+                "SELECT id, website, username FROM passwords \
+                    WHERE account_name = ? AND (website, username, id) < (?, ?, ?) \
+                    ORDER BY website DESC, username DESC, id DESC LIMIT ?;",
+                (self.username, *key, limit)
+            )[::-1]
+
+        operator = {"after": ">", "from": ">="}[direction]
+
+        return self.storage.fetchall(
+            f"SELECT id, website, username FROM passwords \
+                WHERE account_name = ? AND (website, username, id) {operator} (?, ?, ?) \
+                ORDER BY website, username, id LIMIT ?;",
+            (self.username, *key, limit)
+        )
+
+    def get_record(self, entry_id: int) -> tuple:
+        """
+        (id, website, username) of an entry, or None if it does not exist
+        """
+        return self.storage.fetchone(
+            "SELECT id, website, username FROM passwords WHERE account_name = ? AND id = ?;",
+            (self.username, entry_id)
+        )
+
+    @traced("account.get_entry_numbers")
+    def get_entry_numbers(self, entry_ids) -> dict[int, int]:
+        """
+        Maps ID to number of the given entries
+
+        Entries of each account are numbered from 1 in the order they were added, this is the number shown for them.
+        IDs are shared by every account, so they are only used as keys
+        """
+        entry_ids = list(entry_ids)
+        numbers = {}
+
+        for start in range(0, len(entry_ids), NUMBER_LOOKUP_BATCH):
+            batch = entry_ids[start:start + NUMBER_LOOKUP_BATCH]
+            numbers.update(self.storage.fetchall(
+                f"SELECT id, number FROM passwords WHERE account_name = ? AND id IN ({', '.join('?' * len(batch))});",
+                (self.username, *batch)
+            ))
+
+        return numbers
+
+    def get_entry_id(self, number: int) -> int:
+        """
+        ID of the entry with this number, or None if there is none
+        """
+        row = self.storage.fetchone(
+            "SELECT id FROM passwords WHERE account_name = ? AND number = ?;", (self.username, number)
+        )
+
+        return row[0] if row is not None else None
+
+    @traced("account.get_website_entries")
+    def get_website_entries(self, entry_website: str) -> list[tuple[int, str]]:
+        """
+        (id, username) of the entries for a website
+        """
+        return self.storage.fetchall(
+            "SELECT id, username FROM passwords WHERE account_name = ? AND website = ? ORDER BY username;",
+            (self.username, entry_website)
+        )
+
+    @traced("account.search_candidates")
+    def search_candidates(self, query: str, limit: int) -> list[tuple]:
+        """
+        Up to limit (id, website, username) entries that may fuzzy match query. Needs the search index
+
+        Entries containing every term of query with at least 3 characters come first, found with the trigram index,
+        the most relevant first by bm25. The rest is filled with entries that contain the characters of query in order,
+        e.g. abbreviations the index cannot find, in ID order
+        """
+        candidates = []
+        terms = [term for term in query.split() if len(term) >= 3]
+
+        if terms:
+            match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+            candidates = self.storage.fetchall(
+                "SELECT passwords.id, passwords.website, passwords.username \
+                    FROM passwords_fts JOIN passwords ON passwords.id = passwords_fts.rowid \
+                    WHERE passwords_fts MATCH ? AND passwords.account_name = ? \
+                    ORDER BY bm25(passwords_fts) LIMIT ?;",
+                (match, self.username, limit)
+            )
 
-        return records
+        if len(candidates) < limit:
+            # same text fuzzy matching is done on, characters of query in order with anything in between
+            escaped = [f"\\{character}" if character in "%_\\" else character for character in query]
+            pattern = "%" + "%".join(escaped) + "%"
+            found = {row[0] for row in candidates}
 
+            candidates += [row for row in self.storage.fetchall(
+                "SELECT id, website, username FROM passwords \
+                    WHERE account_name = ? AND (website || ' ' || username) LIKE ? ESCAPE '\\' \
+                    ORDER BY id LIMIT ?;",
+                (self.username, pattern, limit)
+            ) if row[0] not in found][:limit - len(candidates)]
+
+        return candidates
+
+    def get_entry_batches(self, batch_size: int = 1000):
+        """
+        Generator of lists of (website, username, encrypted_password), read with a cursor
+
+        Only one batch is held in memory at a time
+        """
+        return self.storage.fetch_batches(
+            "SELECT website, username, encrypted_password FROM passwords WHERE account_name = ?;",
+            (self.username,),
+            batch_size
+        )
+
+    @traced("account.get_key")
     def get_key(self) -> Fernet:
         """
         To be used for creating key for password encryption/decryption    
+
+        The key is derived once and then cached for the rest of the session. 
+        Only the key is kept, the master password is cleared once it is derived
         """
-        return Fernet(urlsafe_b64encode(self.get_hashed_password()))
-    
-    def get_entry_password(self, entry_username: str, entry_website: str) -> str:
+        if self.session_key is None or self.session_key.wiped:
+            if self.password is None:
+                raise ValueError("Account is locked, log in again")
+
+            self.session_key = SessionKey(self.get_hashed_password())
+            self.password = None
+
+        return self.session_key.get()
+
+    def login_changed(self) -> bool:
+        """
+        Check if the master password or Argon2 parameters were changed since this account logged in,
+        e.g. by another process. The key of this session then no longer decrypts the entries
+        """
+        if self.password_hash is None:
+            return False
+
+        stored = self.storage.fetchone("SELECT password_hash FROM user_login WHERE account_name = ?;", (self.username,))
+
+        return stored is None or stored[0] != self.password_hash
+
+    def is_idle(self) -> bool:
+        """
+        Check if the session key has not been used within its idle timeout,
+        or if there is no key yet, that the account was not touched within it since logging in
+        """
+        if self.session_key is not None:
+            return self.session_key.is_idle()
+
+        return monotonic() - self.active_at > DEFAULT_IDLE_TIMEOUT
+
+    def touch(self) -> None:
         """
-        Get fetched plaintext password from entry username and website
+        Reset idle timer of the account, and of the session key if there is one
         """
-        con = connect(PASSWORDS_DATABASE)
+        self.active_at = monotonic()
+
+        if self.session_key is not None:
+            self.session_key.touch()
 
-        enc_pass = con.execute("SELECT encrypted_password FROM passwords \
-                               WHERE account_name = ? \
-                               AND username = ? \
-                               AND website = ?;", 
-                               (self.username, entry_username, entry_website)
-                               ).fetchone()[0]
-        con.close()
+    def lock(self):
+        """
+        Wipe the session key. Use when logging out
+        """
+        if self.session_key is not None:
+            self.session_key.wipe()
+            self.session_key = None
+    
+    @traced("account.get_entry_password")
+    def get_entry_password(self, entry_id: int) -> str:
+        """
+        Get fetched plaintext password of an entry
+        """
+        enc_pass = self.storage.fetchone(
+            "SELECT encrypted_password FROM passwords WHERE id = ? AND account_name = ?;",
+            (entry_id, self.username)
+        )[0]
         
-        password = self.get_key().decrypt(enc_pass).decode()
+        key = self.get_key()
+
+        with span("fernet.decrypt"):
+            password = key.decrypt(enc_pass).decode()
 
         return password
 
-    def add_entry(self, entry_username: str, entry_website: str, entry_password: str):
-        con = connect(PASSWORDS_DATABASE)
+    @traced("account.add_entry")
+    def add_entry(self, entry_username: str, entry_website: str, entry_password: str) -> int:
+        """
+        Insert an entry, returning its ID
+        """
+        try:
+            with self.storage.transaction() as con:
+                cursor = con.execute(
+                    f"INSERT INTO passwords (account_name, number, username, website, encrypted_password) \
+                        VALUES (?, {NEXT_NUMBER}, ?, ?, ?)", 
+                        (self.username, self.username, entry_username, entry_website, entry_password)
+                )
+        except IntegrityError:
+            raise EntryAlreadyExists()
+
+        return cursor.lastrowid
+
+    @traced("account.add_entries")
+    def add_entries(self, entries) -> range:
+        """
+        Insert many entries in a single transaction
 
+        entries is an iterable of (entry_username, entry_website, entry_password), it is consumed lazily.
+        Returns IDs of the new entries, in the order of entries.
+        Raises EntryAlreadyExists and inserts nothing if any of them is not unique
+        """
         try:
-            with con:
-                con.execute(
-                    "INSERT INTO passwords (account_name, username, website, encrypted_password) \
-                        VALUES (?, ?, ?, ?)", 
-                        (self.username, entry_username, entry_website, entry_password)
+            with self.storage.transaction() as con:
+                # take the write lock before reading the largest ID, so no other connection can insert
+                # until this commits, and new IDs follow the current largest one
+                con.execute("BEGIN IMMEDIATE;")
+                first_id = con.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM passwords;").fetchone()[0]
+                cursor = con.executemany(
+                    f"INSERT INTO passwords (account_name, number, username, website, encrypted_password) \
+                        VALUES (?, {NEXT_NUMBER}, ?, ?, ?)", 
+                        ((self.username, self.username, *entry) for entry in entries)
                 )
         except IntegrityError:
-            con.close()
             raise EntryAlreadyExists()
-        else:
-            con.close()
 
-    def edit_entry(self, old_username: str, old_website: str, entry_username: str, entry_website: str, entry_password: str):
-        con = connect(PASSWORDS_DATABASE)
+        return range(first_id, first_id + cursor.rowcount)
 
+    @traced("account.edit_entry")
+    def edit_entry(self, entry_id: int, entry_username: str, entry_website: str, entry_password: str):
         try:
-            with con:
+            with self.storage.transaction() as con:
                 con.execute(
                     "UPDATE passwords SET username = ?, website = ?, encrypted_password = ? \
-                        WHERE account_name = ? AND username = ? AND website = ?", 
-                        (entry_username, entry_website, entry_password, 
-                        self.username, old_username, old_website)
+                        WHERE id = ? AND account_name = ?", 
+                        (entry_username, entry_website, entry_password, entry_id, self.username)
                 )
         except IntegrityError:
-            con.close()
             raise EntryAlreadyExists()
-        else:
-            con.close()
 
-    def delete_entry(self, entry_username: str, entry_website):
-        con = connect(PASSWORDS_DATABASE)
+    @traced("account.delete_entry")
+    def delete_entry(self, entry_id: int):
+        with self.storage.transaction() as con:
+            con.execute(
+                "DELETE FROM passwords WHERE id = ? AND account_name = ?", 
+                (entry_id, self.username)
+            )
+
+
+    @traced("account.change_master_password")
+    def change_master_password(
+            self, new_password: str, new_salt: str, batch_size: int = 1000, 
+            workers: int = None, kdf: KdfParams = None
+        ) -> int:
+        """
+        Change master password, re-encrypting every entry of this account with the new key
+
+        The new key is derived with kdf, or the current parameters if not given. Old and new keys are each derived once. Entries are re-encrypted in parallel batches 
+        and everything, including the new login hash, is committed in one transaction. 
+        If interrupted nothing is changed, so it can simply be run again.
+        A running agent is asked to lock this account first, as its key would no longer decrypt the entries
+
+        Returns number of entries re-encrypted
+        """
+        from texpass.helper.agent_client import lock_in_agent
+
+        kdf = kdf if kdf is not None else self.kdf
+        lock_in_agent(self.username)
+        old_key = self.get_key()
+        new_account = Account(self.username, new_password, new_salt, self.storage, kdf)
+        # decrypts with either key, always encrypts with the new one
+        rotator = MultiFernet([new_account.get_key(), old_key])
+        with span("argon2.hash"):
+            password_hash = kdf.password_hasher().hash(new_password)
+
+        def rotate(encrypted_password: str) -> str:
+            return rotator.rotate(encrypted_password).decode()
+
+        rotated = 0
+        last_id = 0
+
+        with ThreadPoolExecutor(workers) as executor, self.storage.transaction() as con:
+            # take the write lock before reading the first batch, so no other connection can change
+            # an entry after it is read and have that change overwritten with the rotated old one
+            con.execute("BEGIN IMMEDIATE;")
+
+            while True:
+                batch = con.execute(
+                    "SELECT id, encrypted_password FROM passwords \
+                        WHERE account_name = ? AND id > ? ORDER BY id LIMIT ?;",
+                    (self.username, last_id, batch_size)
+                ).fetchall()
+
+                if not batch:
+                    break
+
+                encrypted = executor.map(rotate, [encrypted_password for _, encrypted_password in batch])
+                con.executemany(
+                    "UPDATE passwords SET encrypted_password = ? WHERE id = ?",
+                    ((encrypted_password, entry_id) for (entry_id, _), encrypted_password in zip(batch, encrypted))
+                )
+
+                rotated += len(batch)
+                last_id = batch[-1][0]
 
-        with con:
             con.execute(
-                "DELETE FROM passwords WHERE account_name = ? AND username = ? AND website = ?", 
-                (self.username, entry_username, entry_website)
+                "UPDATE user_login SET password_hash = ?, salt = ?, \
+                    time_cost = ?, memory_cost = ?, parallelism = ? WHERE account_name = ?",
+                (password_hash, new_salt, kdf.time_cost, kdf.memory_cost, kdf.parallelism, self.username)
             )
-        
-        con.close()
 
+        # committed, switch this session over to the new key
+        self.lock()
+        self.salt = new_salt
+        self.kdf = kdf
+        self.password_hash = password_hash
+        self.session_key = new_account.session_key
+
+        return rotated
+
+    @traced("account.upgrade_kdf")
+    def upgrade_kdf(self, password: str, kdf: KdfParams) -> int:
+        """
+        Make the login hash and key of this account with new Argon2 parameters, keeping password and salt
+
+        As the key changes, every entry is re-encrypted like when changing master password.
+        Needs the master password, so it is done while logging in
+
+        Returns number of entries re-encrypted
+        """
+        return self.change_master_password(password, self.salt, kdf = kdf)
+
+    @traced("account.verify_entries")
+    def verify_entries(self, batch_size: int = 1000) -> list[tuple[str, str]]:
+        """
+        Try decrypting every entry with the current key
+
+        Returns (website, username) of entries that could not be decrypted
+        """
+        key = self.get_key()
+        failed = []
+
+        for batch in self.get_entry_batches(batch_size):
+            for website, username, encrypted_password in batch:
+                try:
+                    key.decrypt(encrypted_password)
+                except InvalidToken:
+                    failed.append((website, username))
 
+        return failed
+
+    @traced("account.verify_password")
     def verify_password(self, password_to_verify: str) -> bool:
         """
-        Simply does an equality expression over stored plaintext and given password
+        Check password against the stored login hash, as the master password is not kept
         """
-        return password_to_verify == self.password
+        stored = self.storage.fetchone("SELECT password_hash FROM user_login WHERE account_name = ?;", (self.username,))
+
+        if stored is None:
+            return False
+
+        try:
+            with span("argon2.verify"):
+                return self.kdf.password_hasher().verify(stored[0], password_to_verify)
+        except VerificationError:
+            return False
 
     @classmethod
-    def from_login(cls, username: str, password: str):
+    @traced("account.from_login")
+    def from_login(cls, username: str, password: str, storage: Storage = None, derive_key: bool = True):
         """
         Create account object from login details
+
+        If derive_key, the key is derived on another thread while the password is verified. 
+        argon2 releases the GIL, so with enough cores both take about as long as one of them.
+        The key is only kept if the password is right
+
+        Accounts made before Argon2 parameters were stored are upgraded to calibrated parameters here,
+        which re-encrypts every entry as part of logging in. If that fails, e.g. an entry cannot be decrypted,
+        the account is left as it was and logging in still succeeds
         """
+        storage = storage if storage is not None else get_storage()
+
         # select from database
-        con = connect(PASSWORDS_DATABASE)
-        query = con.execute("SELECT password_hash, salt FROM user_login WHERE account_name = ?;", (username,)).fetchone()
-        con.close()
+        query = storage.fetchone(
+            "SELECT password_hash, salt, time_cost, memory_cost, parallelism FROM user_login WHERE account_name = ?;", 
+            (username,)
+        )
 
         # check username
         if query is None:
             raise UsernameDoesNotExist()
         else:
             # username exists, now verify password
-            hash_, salt = query
+            hash_, salt, time_cost, memory_cost, parallelism = query
+            kdf = KdfParams.from_dict({"time_cost": time_cost, "memory_cost": memory_cost, "parallelism": parallelism})
+            account = cls(username, password, salt, storage, kdf)
+            account.password_hash = hash_
+
+            executor = ThreadPoolExecutor(1) if derive_key else None
+            derivation = executor.submit(account.get_hashed_password) if derive_key else None
 
             try:
-                PasswordHasher().verify(hash_, password)
+                with span("argon2.verify"):
+                    kdf.password_hasher().verify(hash_, password)
             except VerifyMismatchError:
+                # the key being derived is dropped once done, a wrong password does not wait for it
                 raise WrongPassword
-            else:
-                # password verified
-                return cls(username, password, salt)
+            finally:
+                if executor is not None:
+                    executor.shutdown(wait = False)
+
+            # password verified
+            if derivation is not None:
+                with span("account.wait_for_key"):
+                    account.session_key = SessionKey(derivation.result())
+                account.password = None
+
+            if time_cost is None:
+                # made before parameters were stored, move it to parameters calibrated for this machine
+                try:
+                    account.upgrade_kdf(password, calibrated_params())
+                except (SQLiteError, InvalidToken):
+                    # e.g. database is locked or an entry is corrupt, nothing was changed and it is tried again next login
+                    pass
+
+            return account
     
     @classmethod
-    def from_register(cls, username: str, password: str, salt: str):
+    @traced("account.from_register")
+    def from_register(
+            cls, username: str, password: str, salt: str, storage: Storage = None, kdf: KdfParams = None, is_cancelled = None
+        ):
         """
         Create account object from register details
 
-        Saves new account to database if username is unique
+        Saves new account to database if username is unique. 
+        Argon2 parameters are calibrated for this machine if kdf is not given.
+        Raises RegisterCancelled without saving if is_cancelled returns True once the password is hashed
         """
-        con = connect(PASSWORDS_DATABASE)
+        storage = storage if storage is not None else get_storage()
+        kdf = kdf if kdf is not None else calibrated_params()
+        # hash before taking the connection, it is the slow part
+        with span("argon2.hash"):
+            password_hash = kdf.password_hasher().hash(password)
+
+        if is_cancelled is not None and is_cancelled():
+            raise RegisterCancelled()
+
         try:
             # insert to database
-            with con:
+            with storage.transaction() as con:
                 con.execute(
-                    "INSERT INTO user_login (account_name, password_hash, salt) \
-                        VALUES (?, ?, ?);",
-                        (username, PasswordHasher().hash(password), salt)
+                    "INSERT INTO user_login (account_name, password_hash, salt, time_cost, memory_cost, parallelism) \
+                        VALUES (?, ?, ?, ?, ?, ?);",
+                        (username, password_hash, salt, kdf.time_cost, kdf.memory_cost, kdf.parallelism)
                     )
         except IntegrityError:
             # if username already exists
-            con.close()
             raise UsernameAlreadyExists("Username already exists!")
         else:
-            # successful. close and return
-            con.close()
-            return cls(username, password, salt)
+            # successful
+            account = cls(username, password, salt, storage, kdf)
+            account.password_hash = password_hash
 
+            return account
+
+    @traced("account.delete_account")
     def delete_account(self):
-        con = connect(PASSWORDS_DATABASE)
-        
-        with con:
+        with self.storage.transaction() as con:
             con.execute("DELETE FROM passwords WHERE account_name = ?", (self.username,))
             con.execute("DELETE FROM user_login WHERE account_name = ?", (self.username,))
-        
-        con.close()
\ No newline at end of file
+
+        self.lock()
\ No newline at end of file
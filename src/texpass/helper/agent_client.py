@@ -0,0 +1,90 @@
+"""
+Client for the texpass agent, which keeps unlocked accounts in memory
+
+Requests and responses are single lines of JSON over a Unix socket
+"""
+import os
+import json
+import socket
+import tempfile
+
+from texpass.exceptions.exceptions import AgentUnavailable, AgentLocked, AgentError
+from texpass.helper.storage import PASSWORDS_DATABASE
+
+AGENT_SOCKET_ENV = "TEXPASS_AGENT_SOCK"
+"""environment variable with the socket path, like SSH_AUTH_SOCK"""
+
+
+def default_socket_path() -> str:
+    """
+    Socket path from the environment, else a file in a directory only this user can access
+    """
+    if os.environ.get(AGENT_SOCKET_ENV):
+        return os.environ[AGENT_SOCKET_ENV]
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"texpass-{os.getuid()}")
+
+    return os.path.join(runtime_dir, "texpass-agent.sock")
+
+
+def database_path() -> str:
+    """
+    Absolute path of the database this process would use, so the agent can check it serves the same one
+    """
+    return os.path.abspath(PASSWORDS_DATABASE)
+
+
+class AgentClient:
+    """
+    Sends requests to a running agent, one connection per request
+    """
+    def __init__(self, path: str = None, timeout: float = 30):
+        self.path = path if path is not None else default_socket_path()
+        self.timeout = timeout
+
+    def request(self, op: str, **fields):
+        """
+        Send a request and return its result
+
+        Raises AgentUnavailable if no agent is listening, or if it serves another database.
+        Raises AgentLocked if the account has to be unlocked first, and AgentError for any other failure
+        """
+        message = json.dumps({"op": op, "database": database_path(), **fields}).encode() + b"\n"
+
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.path)
+                sock.sendall(message)
+
+                with sock.makefile("rb") as stream:
+                    line = stream.readline()
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise AgentUnavailable()
+
+        if not line:
+            raise AgentUnavailable()
+
+        response = json.loads(line)
+
+        if response["ok"]:
+            return response.get("result")
+        elif response.get("code") == "locked":
+            raise AgentLocked()
+        elif response.get("code") == "database":
+            raise AgentUnavailable()
+        else:
+            raise AgentError(response.get("error", "Agent request failed"))
+
+
+def lock_in_agent(account_name: str) -> bool:
+    """
+    Lock an account in the running agent, if there is one. Use before its key changes
+
+    Returns True if the agent had it unlocked
+    """
+    try:
+        return bool(AgentClient().request("lock", account=account_name))
+    except (AgentUnavailable, AgentError, OSError):
+        # no agent for this database, or it did not answer
+        return False
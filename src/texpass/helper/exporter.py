@@ -0,0 +1,70 @@
+import csv
+import json
+from typing import Iterable, TextIO
+
+from texpass.helper.importer import batched
+
+BACKUP_MAGIC = "texpass-backup 1"
+"""first line of an encrypted backup"""
+
+FORMATS = ("csv", "jsonl", "backup")
+
+
+def _to_record(entry: tuple[str, str, str]) -> dict:
+    website, username, password = entry
+    return {"website": website, "username": username, "password": password}
+
+
+def write_csv(entries: Iterable[tuple[str, str, str]], stream: TextIO) -> int:
+    """
+    Write (website, username, password) entries as CSV with a header row
+
+    Returns number of entries written
+    """
+    writer = csv.writer(stream)
+    writer.writerow(["website", "username", "password"])
+
+    count = 0
+    for entry in entries:
+        writer.writerow(entry)
+        count += 1
+
+    return count
+
+
+def write_jsonl(entries: Iterable[tuple[str, str, str]], stream: TextIO) -> int:
+    """
+    Write (website, username, password) entries as one JSON object per line
+
+    Returns number of entries written
+    """
+    count = 0
+    for entry in entries:
+        stream.write(json.dumps(_to_record(entry)) + "\n")
+        count += 1
+
+    return count
+
+
+def write_backup(
+        entries: Iterable[tuple[str, str, str]], stream: TextIO, 
+        key: "Fernet", header: dict, batch_size: int = 1000
+    ) -> int:
+    """
+    Write (website, username, password) entries as an encrypted backup
+
+    The backup is a magic line, a JSON header line with what is needed to derive the key again (never the key),
+    then one Fernet token per line. Each token holds a batch of entries as JSON lines
+
+    Returns number of entries written
+    """
+    stream.write(BACKUP_MAGIC + "\n")
+    stream.write(json.dumps(header) + "\n")
+
+    count = 0
+    for batch in batched(entries, batch_size):
+        payload = "\n".join(json.dumps(_to_record(entry)) for entry in batch)
+        stream.write(key.encrypt(payload.encode()).decode() + "\n")
+        count += len(batch)
+
+    return count
@@ -0,0 +1,159 @@
+import csv
+from json import JSONDecoder, loads
+from itertools import islice
+from typing import Iterable, Iterator, TextIO
+
+# lower case column names used by common password manager exports
+WEBSITE_FIELDS = ("website", "url", "login_uri", "uri", "name")
+USERNAME_FIELDS = ("username", "login_username", "login", "user", "email")
+PASSWORD_FIELDS = ("password", "login_password")
+
+FORMATS = ("csv", "json", "backup")
+
+
+class ImportReport:
+    """
+    Outcome of a bulk import
+    """
+    def __init__(self):
+        self.imported = 0
+        self.duplicates: list[tuple[str, str]] = []
+        """(website, username) of entries that already exist, or appear twice in the import"""
+        self.invalid = 0
+        """number of records without a website or username"""
+
+
+def _pick(record: dict, fields: tuple[str]) -> str:
+    """
+    Value of the first of fields found in record, matched case insensitively
+    """
+    lowered = {str(key).strip().lower(): value for key, value in record.items()}
+
+    for field in fields:
+        value = lowered.get(field)
+
+        if value is not None:
+            return str(value)
+
+    return ""
+
+
+def _to_entry(record: dict) -> tuple[str, str, str]:
+    return (
+        _pick(record, WEBSITE_FIELDS),
+        _pick(record, USERNAME_FIELDS),
+        _pick(record, PASSWORD_FIELDS)
+    )
+
+
+def read_csv(stream: TextIO) -> Iterator[tuple[str, str, str]]:
+    """
+    Yield (website, username, password) from a CSV export with a header row
+    """
+    for record in csv.DictReader(stream):
+        yield _to_entry(record)
+
+
+def read_json(stream: TextIO, chunk_size: int = 64 * 1024) -> Iterator[tuple[str, str, str]]:
+    """
+    Yield (website, username, password) from a JSON export
+
+    Accepts either a top level array of objects or one object per line (JSON lines).
+    The stream is decoded one object at a time, so the whole file is never loaded
+    """
+    decoder = JSONDecoder()
+    buffer = ""
+    # start of what is not decoded yet. Only advanced, the buffer is cut once per chunk read
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = stream.read(chunk_size)
+        eof = chunk == ""
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return not eof
+
+    def skip(characters: str):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in characters:
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    skip(" \t\r\n")
+    in_array = buffer.startswith("[", pos)
+    if in_array:
+        pos += 1
+
+    while True:
+        skip(" \t\r\n,")
+
+        if pos == len(buffer) or (in_array and buffer.startswith("]", pos)):
+            return
+
+        try:
+            record, pos = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            # object is cut off at the end of the buffer
+            if not fill():
+                raise
+            continue
+
+        if isinstance(record, dict):
+            yield _to_entry(record)
+
+
+def read_backup(stream: TextIO, password: str) -> Iterator[tuple[str, str, str]]:
+    """
+    Yield (website, username, password) from an encrypted backup made by texpass
+
+    password is the master password of the account the backup was made from.
+    Raises ValueError if the stream is not a backup, and cryptography's InvalidToken if the password is wrong
+    """
+    from texpass.helper.account import Account
+    from texpass.helper.exporter import BACKUP_MAGIC
+    from texpass.helper.kdf import KdfParams
+
+    if stream.readline().strip() != BACKUP_MAGIC:
+        raise ValueError("Not a texpass backup")
+
+    header = loads(stream.readline())
+    account = Account(password=password, salt=header["salt"], kdf=KdfParams.from_dict(header))
+    key = account.get_key()
+
+    try:
+        for line in stream:
+            if not line.strip():
+                continue
+
+            for record in key.decrypt(line.strip().encode()).decode().splitlines():
+                yield _to_entry(loads(record))
+    finally:
+        account.lock()
+
+
+def read_entries(stream: TextIO, format_: str, password: str = None) -> Iterator[tuple[str, str, str]]:
+    """
+    Read entries in the given format. password is only needed for backups
+    """
+    if format_ == "csv":
+        return read_csv(stream)
+    elif format_ == "json":
+        return read_json(stream)
+    elif format_ == "backup":
+        return read_backup(stream, password)
+    else:
+        raise ValueError(f"Unknown import format {format_}")
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """
+    Split iterable into lists of at most size items
+    """
+    iterator = iter(iterable)
+
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -0,0 +1,172 @@
+"""
+Opt in timing of hot paths
+
+Set the TEXPASS_TRACE environment variable to a file path before starting texpass to enable it.
+Aggregates of every span (count, total, p50, p95, max) are appended to that file as JSON lines on exit.
+
+Tracing is decided once at import. When it is disabled `traced` returns functions unchanged
+and `span` returns a shared no-op context manager, so the cost is close to nothing
+"""
+import os
+import json
+import atexit
+from time import perf_counter, time
+from random import random
+from threading import Lock
+from functools import wraps
+from contextlib import nullcontext
+
+TRACE_ENV = "TEXPASS_TRACE"
+
+# samples kept per span for percentiles. count, total and max are always exact
+MAX_SAMPLES = 10_000
+
+_NULL_SPAN = nullcontext()
+
+
+class Aggregate:
+    """
+    Durations recorded for one span name
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: list[float] = []
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        elif random() < MAX_SAMPLES / self.count:
+            # reservoir sampling, so percentiles stay representative
+            self.samples[int(random() * MAX_SAMPLES)] = seconds
+
+    def percentile(self, percent: float) -> float:
+        values = sorted(self.samples)
+        return values[min(int(percent / 100 * len(values)), len(values) - 1)]
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, perf_counter() - self.start)
+        return False
+
+
+class Tracer:
+    """
+    Collects span durations and counters, and writes their aggregates to a JSON lines file
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.spans: dict[str, Aggregate] = {}
+        self.counters: dict[str, int] = {}
+        self._lock = Lock()
+
+    def span(self, name: str) -> Span:
+        return Span(self, name)
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            if name not in self.spans:
+                self.spans[name] = Aggregate()
+
+            self.spans[name].add(seconds)
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self) -> list[dict]:
+        with self._lock:
+            lines = []
+            timestamp = time()
+
+            for name, aggregate in sorted(self.spans.items()):
+                lines.append({
+                    "time": timestamp,
+                    "pid": os.getpid(),
+                    "kind": "span",
+                    "name": name,
+                    "count": aggregate.count,
+                    "total_ms": aggregate.total * 1000,
+                    "p50_ms": aggregate.percentile(50) * 1000,
+                    "p95_ms": aggregate.percentile(95) * 1000,
+                    "max_ms": aggregate.max * 1000,
+                })
+
+            for name, value in sorted(self.counters.items()):
+                lines.append({"time": timestamp, "pid": os.getpid(), "kind": "counter", "name": name, "count": value})
+
+            return lines
+
+    def flush(self):
+        """
+        Append aggregates to the trace file
+        """
+        lines = self.summary()
+
+        if lines:
+            with open(self.path, "a") as file:
+                for line in lines:
+                    file.write(json.dumps(line) + "\n")
+
+
+_tracer: Tracer = None
+
+if os.environ.get(TRACE_ENV):
+    _tracer = Tracer(os.environ[TRACE_ENV])
+    atexit.register(_tracer.flush)
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str):
+    """
+    Context manager timing its body under name. Does nothing if tracing is disabled
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+
+    return _tracer.span(name)
+
+
+def count(name: str, amount: int = 1):
+    """
+    Add to a counter. Does nothing if tracing is disabled
+    """
+    if _tracer is not None:
+        _tracer.count(name, amount)
+
+
+def traced(name: str):
+    """
+    Decorator timing every call of a function under name
+
+    Returns the function itself if tracing is disabled
+    """
+    def decorator(func):
+        if _tracer is None:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
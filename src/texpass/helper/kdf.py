@@ -0,0 +1,134 @@
+"""
+Argon2 parameters of an account, and calibrating them to the machine texpass runs on
+"""
+import os
+from time import perf_counter
+
+# milliseconds a key derivation should take on this machine
+KDF_TARGET_ENV = "TEXPASS_KDF_TARGET_MS"
+DEFAULT_TARGET_MS = 500
+
+# memory used per derivation, in KiB
+DEFAULT_MEMORY_COST = 65536
+# slow machines go down to this, the OWASP minimum for argon2id at two passes
+MIN_MEMORY_COST = 19456
+MIN_TIME_COST = 2
+MAX_TIME_COST = 64
+MAX_PARALLELISM = 16
+
+
+class KdfParams:
+    """
+    Argon2id cost parameters. Both the login hash and the encryption key of an account are made with them
+    """
+    def __init__(self, time_cost: int, memory_cost: int, parallelism: int):
+        self.time_cost = time_cost
+        self.memory_cost = memory_cost
+        """in KiB"""
+        self.parallelism = parallelism
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, KdfParams) and self.as_dict() == other.as_dict()
+
+    def __repr__(self) -> str:
+        return f"KdfParams(time_cost={self.time_cost}, memory_cost={self.memory_cost}, parallelism={self.parallelism})"
+
+    def as_dict(self) -> dict:
+        return {"time_cost": self.time_cost, "memory_cost": self.memory_cost, "parallelism": self.parallelism}
+
+    @classmethod
+    def from_dict(cls, params: dict):
+        """
+        Parameters stored by `as_dict`. Data from before parameters were stored gets LEGACY_PARAMS
+        """
+        if params.get("time_cost") is None:
+            return LEGACY_PARAMS
+
+        return cls(params["time_cost"], params["memory_cost"], params["parallelism"])
+
+    def password_hasher(self):
+        """
+        argon2-cffi PasswordHasher hashing with these parameters
+        """
+        from argon2 import PasswordHasher
+
+        return PasswordHasher(time_cost = self.time_cost, memory_cost = self.memory_cost, parallelism = self.parallelism)
+
+
+LEGACY_PARAMS = KdfParams(time_cost = 3, memory_cost = 65536, parallelism = 4)
+"""parameters of accounts made before they were stored per account"""
+
+
+def available_cores() -> int:
+    """
+    Number of cores this process may run on
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def target_ms() -> float:
+    return float(os.environ.get(KDF_TARGET_ENV, DEFAULT_TARGET_MS))
+
+
+def time_derivation(params: KdfParams) -> float:
+    """
+    Milliseconds one key derivation with params takes
+    """
+    from argon2.low_level import hash_secret_raw, Type
+
+    start = perf_counter()
+    hash_secret_raw(
+        secret = b"calibration", salt = b"calibrationsalt",
+        time_cost = params.time_cost, memory_cost = params.memory_cost,
+        parallelism = params.parallelism, hash_len = 32, type = Type.ID
+    )
+
+    return (perf_counter() - start) * 1000
+
+
+def calibrate(target: float = None, parallelism: int = None) -> KdfParams:
+    """
+    Parameters that make a key derivation take about target milliseconds here
+
+    Logging in derives the key while verifying the password, so by default each gets half of the available cores.
+    Memory is kept at DEFAULT_MEMORY_COST and passes are added until the target is reached.
+    If the fewest passes already take longer, memory is lowered instead, down to MIN_MEMORY_COST.
+    Costs about two derivations with the fewest passes
+    """
+    target = target if target is not None else target_ms()
+    parallelism = parallelism if parallelism is not None else min(max(available_cores() // 2, 1), MAX_PARALLELISM)
+    memory_cost = DEFAULT_MEMORY_COST
+
+    while True:
+        base = time_derivation(KdfParams(MIN_TIME_COST, memory_cost, parallelism))
+
+        if base <= target or memory_cost == MIN_MEMORY_COST:
+            break
+
+        # time grows about linearly with memory
+        memory_cost = max(int(memory_cost * target / base), MIN_MEMORY_COST)
+
+    # filling memory is a fixed cost, so time the cost of one more pass on its own
+    per_pass = time_derivation(KdfParams(MIN_TIME_COST + 1, memory_cost, parallelism)) - base
+    extra_passes = int((target - base) / per_pass) if per_pass > 0 else 0
+    time_cost = min(max(MIN_TIME_COST + extra_passes, MIN_TIME_COST), MAX_TIME_COST)
+
+    return KdfParams(time_cost, memory_cost, parallelism)
+
+
+_calibrated: KdfParams = None
+
+
+def calibrated_params() -> KdfParams:
+    """
+    `calibrate` with the default target, run once per process
+    """
+    global _calibrated
+
+    if _calibrated is None:
+        _calibrated = calibrate()
+
+    return _calibrated
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+from texpass.helper.instrument import count
+
+DEFAULT_MAX_ENTRIES = 16
+# seconds a decrypted password is kept after it was decrypted
+DEFAULT_TTL = 60
+
+
+class PasswordCache:
+    """
+    Small cache of decrypted passwords, so viewing and copying the same entry again skips SQLite and Fernet
+
+    Entries are dropped after a fixed time to live, and the least recently used one is dropped when full.
+    Passwords are kept in buffers that are overwritten when dropped. The strings handed out are
+    immutable copies, so wiping only covers what the cache itself holds
+    """
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[int, tuple[bytearray, float]] = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _wipe(buffer: bytearray):
+        for i in range(len(buffer)):
+            buffer[i] = 0
+
+    def get(self, entry_id: int) -> str:
+        """
+        Cached password of an entry, or None if it is not cached or has expired
+        """
+        with self._lock:
+            cached = self._entries.get(entry_id)
+
+            if cached is not None and cached[1] <= monotonic():
+                self._wipe(self._entries.pop(entry_id)[0])
+                cached = None
+
+            if cached is None:
+                self.misses += 1
+                count("password_cache.miss")
+                return None
+
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            count("password_cache.hit")
+
+            return cached[0].decode()
+
+    def put(self, entry_id: int, password: str):
+        with self._lock:
+            if entry_id in self._entries:
+                self._wipe(self._entries.pop(entry_id)[0])
+
+            self._entries[entry_id] = (bytearray(password.encode()), monotonic() + self.ttl)
+
+            while len(self._entries) > self.max_entries:
+                self._wipe(self._entries.popitem(last=False)[1][0])
+
+    def invalidate(self, entry_id: int):
+        """
+        Drop an entry, if it is cached
+        """
+        with self._lock:
+            cached = self._entries.pop(entry_id, None)
+
+            if cached is not None:
+                self._wipe(cached[0])
+
+    def clear(self):
+        """
+        Drop and overwrite every cached password
+        """
+        with self._lock:
+            for buffer, _ in self._entries.values():
+                self._wipe(buffer)
+
+            self._entries.clear()
@@ -0,0 +1,30 @@
+"""
+Import the modules needed after login in the background, while the login screen is shown
+"""
+from importlib import import_module
+
+# most expensive first, logging in needs argon2 and cryptography before anything else
+POST_LOGIN_MODULES = (
+    "texpass.helper.account",
+    "texpass.controller.table_controller",
+    "texpass.screens.table",
+    "texpass.screens.edit_entry",
+    "texpass.screens.confirm",
+    "pyperclip",
+)
+
+
+def preload(modules: tuple[str] = POST_LOGIN_MODULES, is_cancelled=None):
+    """
+    Import modules one by one, stopping early if is_cancelled() returns True
+
+    Import errors are ignored, they are raised again where the module is actually used
+    """
+    for name in modules:
+        if is_cancelled is not None and is_cancelled():
+            return
+
+        try:
+            import_module(name)
+        except ImportError:
+            pass
@@ -0,0 +1,54 @@
+from time import monotonic
+from base64 import urlsafe_b64encode
+
+from cryptography.fernet import Fernet
+
+# seconds without any key use before the session is considered idle
+DEFAULT_IDLE_TIMEOUT = 300
+
+
+class SessionKey:
+    """
+    Encryption key derived once per unlocked session
+
+    The encoded key is kept in a mutable buffer so it can be overwritten when the session ends.
+    Note that Fernet keeps its own copy internally, so wiping is best effort
+    """
+    def __init__(self, raw_key: bytes, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self._key = bytearray(urlsafe_b64encode(raw_key))
+        self._fernet = Fernet(bytes(self._key))
+
+        self.idle_timeout = idle_timeout
+        self._last_used = monotonic()
+
+    @property
+    def wiped(self) -> bool:
+        return self._fernet is None
+
+    def touch(self) -> None:
+        """
+        Mark the session as active, resetting the idle timer
+        """
+        self._last_used = monotonic()
+
+    def is_idle(self) -> bool:
+        return (monotonic() - self._last_used) > self.idle_timeout
+
+    def get(self) -> Fernet:
+        """
+        Get Fernet object for this session. Also resets the idle timer
+        """
+        if self.wiped:
+            raise ValueError("Session key has been wiped")
+
+        self.touch()
+        return self._fernet
+
+    def wipe(self) -> None:
+        """
+        Overwrite the key buffer and drop the Fernet object
+        """
+        for i in range(len(self._key)):
+            self._key[i] = 0
+
+        self._fernet = None
@@ -1,7 +1,10 @@
-from texpass.helper.account import Account
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from texpass.helper.account import Account
 
 class Status:
-    def __init__(self, status: bool, *, account: Account = None, message: str = None):
+    def __init__(self, status: bool, *, account: "Account" = None, message: str = None):
         self.status = status
         self.account = account
         self.message = message
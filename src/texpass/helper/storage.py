@@ -0,0 +1,153 @@
+from sqlite3 import connect, Connection
+from threading import RLock
+from contextlib import contextmanager
+
+from texpass.helper.instrument import traced, span
+
+# TODO use some kind of config file to get name
+PASSWORDS_DATABASE = "passwords.db"
+
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+class Storage:
+    """
+    Keeps a single SQLite connection open for the whole session
+
+    Statements are cached by the connection, so repeated queries are only parsed once.
+    The connection is opened on first use, and reopened on the next use after `close()`
+
+    Can be shared between threads, access to the connection is serialised with a lock
+    """
+    def __init__(
+            self,
+            path: str = PASSWORDS_DATABASE,
+            *,
+            journal_mode: str = "WAL",
+            synchronous: str = "NORMAL",
+            cache_size: int = -8000,
+            mmap_size: int = 64 * 1024 * 1024,
+            cached_statements: int = 128
+        ):
+        """
+        :param int cache_size: Page cache size. Negative values are in KiB, positive ones in pages
+        :param int mmap_size: Bytes of the database file to memory map. 0 disables it
+        """
+        journal_mode = journal_mode.upper()
+        synchronous = synchronous.upper()
+
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal mode {journal_mode}")
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unknown synchronous mode {synchronous}")
+
+        self.path = path
+        self.pragmas = {
+            "journal_mode": journal_mode,
+            "synchronous": synchronous,
+            "cache_size": int(cache_size),
+            "mmap_size": int(mmap_size),
+        }
+        self.cached_statements = cached_statements
+
+        self._con: Connection = None
+        self._lock = RLock()
+
+    @property
+    def connection(self) -> Connection:
+        """
+        Open connection, connecting and applying pragmas if needed
+        """
+        with self._lock:
+            if self._con is None:
+                self._con = connect(self.path, cached_statements=self.cached_statements, check_same_thread=False)
+
+                for pragma, value in self.pragmas.items():
+                    self._con.execute(f"PRAGMA {pragma} = {value};")
+
+            return self._con
+
+    @traced("sqlite.fetchone")
+    def fetchone(self, sql: str, params: tuple = ()) -> tuple:
+        with self._lock:
+            return self.connection.execute(sql, params).fetchone()
+
+    @traced("sqlite.fetchall")
+    def fetchall(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def fetch_batches(self, sql: str, params: tuple = (), batch_size: int = 1000):
+        """
+        Generator of lists of at most batch_size rows, read from a single cursor
+
+        The lock is only held while fetching, so other queries can run between batches
+        """
+        with self._lock:
+            cursor = self.connection.execute(sql, params)
+
+        try:
+            while True:
+                with self._lock, span("sqlite.fetchmany"):
+                    batch = cursor.fetchmany(batch_size)
+
+                if not batch:
+                    return
+
+                yield batch
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager yielding the connection. Commits on success, rolls back on exception
+        """
+        with self._lock, span("sqlite.transaction"):
+            con = self.connection
+            with con:
+                yield con
+
+    def close(self):
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+
+_storage: Storage = None
+
+
+def get_storage() -> Storage:
+    """
+    Get the shared Storage object used by the app
+    """
+    global _storage
+
+    if _storage is None:
+        _storage = Storage()
+
+    return _storage
+
+
+def configure_storage(**kwargs) -> Storage:
+    """
+    Replace the shared Storage object with one using the given path and pragmas
+
+    Takes the same keyword arguments as `Storage`
+    """
+    global _storage
+
+    close_storage()
+    _storage = Storage(**kwargs)
+
+    return _storage
+
+
+def close_storage():
+    """
+    Close connection of the shared Storage object, if it was ever opened
+    """
+    if _storage is not None:
+        _storage.close()
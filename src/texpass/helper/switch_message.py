@@ -1,13 +1,16 @@
+from typing import TYPE_CHECKING
+
 from textual.message import Message
 
-from texpass.helper.account import Account
+if TYPE_CHECKING:
+    from texpass.helper.account import Account
 
 
 class Switch(Message):
     """
     Switch screen with account
     """
-    def __init__(self, *, account: Account = None, switch_else: bool = False):
+    def __init__(self, *, account: "Account" = None, switch_else: bool = False):
         """
         If login/register successful, set account
         If user wants to switch to the other screen (login/register),
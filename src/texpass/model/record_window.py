@@ -0,0 +1,114 @@
+class RecordWindow:
+    """
+    Contiguous part of an account's entries in website order, loaded a page at a time
+
+    Pages are read with keyset pagination, so loading one costs the same wherever it is in the vault.
+    At most max_pages pages are held, loading past that drops pages from the other end
+    """
+    def __init__(self, fetch_page, page_size: int = 200, max_pages: int = 5):
+        """
+        :param fetch_page: Callable taking key, direction and limit, returning (id, website, username) rows
+            in website order. See `Account.get_records_page`
+        """
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+        self.rows: list[tuple] = []
+        """loaded (id, website, username) rows, in website order"""
+        self.at_start = True
+        """True if there are no rows before the loaded ones"""
+        self.at_end = True
+        """True if there are no rows after the loaded ones"""
+
+    @staticmethod
+    def sort_key(row: tuple) -> tuple:
+        """
+        (website, username, id) of a row, the order rows are shown in
+        """
+        record_id, website, username = row
+        return website, username, record_id
+
+    def load_first(self) -> list[tuple]:
+        """
+        Load the first page, dropping anything loaded before
+        """
+        self.rows = self.fetch_page(None, "after", self.page_size + 1)
+        self.at_start = True
+        self.at_end = len(self.rows) <= self.page_size
+        del self.rows[self.page_size:]
+
+        return self.rows
+
+    def load_next(self) -> int:
+        """
+        Load the page after the loaded rows
+
+        Returns number of rows dropped from the start to stay within max_pages
+        """
+        if self.at_end or not self.rows:
+            return 0
+
+        page = self.fetch_page(self.sort_key(self.rows[-1]), "after", self.page_size + 1)
+        self.at_end = len(page) <= self.page_size
+        self.rows += page[:self.page_size]
+
+        dropped = max(len(self.rows) - self.page_size * self.max_pages, 0)
+
+        if dropped:
+            del self.rows[:dropped]
+            self.at_start = False
+
+        return dropped
+
+    def load_previous(self) -> int:
+        """
+        Load the page before the loaded rows
+
+        Returns number of rows added at the start
+        """
+        if self.at_start or not self.rows:
+            return 0
+
+        page = self.fetch_page(self.sort_key(self.rows[0]), "before", self.page_size + 1)
+        self.at_start = len(page) <= self.page_size
+        page = page[-self.page_size:]
+        self.rows = page + self.rows
+
+        dropped = max(len(self.rows) - self.page_size * self.max_pages, 0)
+
+        if dropped:
+            del self.rows[-dropped:]
+            self.at_end = False
+
+        return len(page)
+
+    def load_around(self, row: tuple) -> list[tuple]:
+        """
+        Load half a page before row, and a page from row on. Use to show a row that may not be loaded
+        """
+        key = self.sort_key(row)
+        before = self.fetch_page(key, "before", self.page_size // 2 + 1)
+        after = self.fetch_page(key, "from", self.page_size + 1)
+
+        self.at_start = len(before) <= self.page_size // 2
+        self.at_end = len(after) <= self.page_size
+        self.rows = before[-(self.page_size // 2):] + after[:self.page_size]
+
+        return self.rows
+
+    def reload(self) -> list[tuple]:
+        """
+        Load the same range of rows again, e.g. after entries were added, edited or deleted
+        """
+        if self.at_start or not self.rows:
+            size = max(len(self.rows), self.page_size)
+            self.rows = self.fetch_page(None, "after", size + 1)
+        else:
+            size = len(self.rows)
+            self.rows = self.fetch_page(self.sort_key(self.rows[0]), "from", size + 1)
+
+        self.at_end = len(self.rows) <= size
+        del self.rows[size:]
+
+        return self.rows
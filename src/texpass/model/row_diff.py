@@ -0,0 +1,17 @@
+class RowDiff:
+    """
+    Changes to turn one ordered list of row keys into another
+    """
+    def __init__(self, old_keys: list[str], new_keys: list[str]):
+        old_set = set(old_keys)
+        new_set = set(new_keys)
+
+        self.new_keys = new_keys
+        self.removed = [key for key in old_keys if key not in new_set]
+        """keys to remove, in old order"""
+        self.added = [key for key in new_keys if key not in old_set]
+        """keys to insert, in new order"""
+
+        kept = [key for key in old_keys if key in new_set]
+        self.appended_in_order = kept + self.added == new_keys
+        """True if removing rows and appending the added ones already gives the new order"""
@@ -0,0 +1,124 @@
+from heapq import nsmallest
+
+
+class FuzzyScorer:
+    """
+    Textual's fuzzy Matcher: the characters of the query have to appear in order, anywhere in the row
+    """
+    name = "fuzzy"
+
+    def matcher(self, query: str):
+        """
+        Callable scoring a lowercased haystack against query, 0 if it does not match
+        """
+        # imported here so the model can be used without loading Textual
+        from textual.fuzzy import Matcher
+
+        # Matcher lowercases both sides itself, so lowercased haystacks score the same as the originals
+        return Matcher(query).match
+
+
+class SubstringScorer:
+    """
+    Every whitespace separated term of the query has to appear in the row as it is typed, ignoring case
+
+    Only needs str.find, so it is much faster than fuzzy matching. Terms found at the start of a word score higher
+    """
+    name = "substring"
+
+    def matcher(self, query: str):
+        terms = query.lower().split()
+
+        def score(haystack: str) -> float:
+            total = 1
+
+            for term in terms:
+                position = haystack.find(term)
+
+                if position == -1:
+                    return 0
+
+                total += 2 if position == 0 or not haystack[position - 1].isalnum() else 1
+
+            return total
+
+        return score
+
+
+SCORERS = {scorer.name: scorer for scorer in (FuzzyScorer, SubstringScorer)}
+"""scorer classes by name"""
+
+
+def make_scorer(name: str):
+    if name not in SCORERS:
+        raise ValueError(f"Unknown scorer {name}")
+
+    return SCORERS[name]()
+
+
+def _rank(match: tuple[int, float]) -> tuple[float, int]:
+    # best score first, ties in row order
+    return -match[1], match[0]
+
+
+class SearchResult:
+    """
+    Matches of a query as a read only sequence of (row, score), best first with ties in row order
+
+    Matches are only ranked as far as they are read. Reading the first few picks them with a heap,
+    the rest is sorted the first time something past them is read
+    """
+    HEAP_FRACTION = 0.25
+    """a heap is used while fewer than this share of the matches are ranked, a full sort above it"""
+
+    def __init__(self, rows, matches: list[tuple[int, float]]):
+        """
+        :param rows: Sequence of the rows that were searched
+        :param matches: (index in rows, score) of each matching row, in row order
+        """
+        self.rows = rows
+        self.matches = matches
+        self._ranked: list[tuple[int, float]] = []
+        self._complete = False
+
+    def _rank_first(self, count: int):
+        """
+        Make sure at least the best count matches are ranked
+        """
+        if self._complete or count <= len(self._ranked):
+            return
+
+        if count < len(self.matches) * self.HEAP_FRACTION:
+            self._ranked = nsmallest(count, self.matches, key = _rank)
+        else:
+            self._ranked = sorted(self.matches, key = _rank)
+            self._complete = True
+
+    def __len__(self) -> int:
+        return len(self.matches)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            self._rank_first(max(start, stop) if step > 0 else start + 1)
+
+            return [(self.rows[row_index], score) for row_index, score in self._ranked[index]]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("search result index out of range")
+
+        self._rank_first(index + 1)
+        row_index, score = self._ranked[index]
+
+        return (self.rows[row_index], score)
+
+    def __iter__(self):
+        self._rank_first(len(self))
+
+        for row_index, score in self._ranked:
+            yield (self.rows[row_index], score)
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
@@ -0,0 +1,236 @@
+"""
+Search split across processes, for tables too large to score on one core
+
+The normalised search strings are written once to shared memory, split into one shard per worker.
+A query only sends the shard's location and the query to each worker, which scores its shard
+and returns its best matches. These are merged into the best matches overall
+"""
+import atexit
+import multiprocessing
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, CancelledError, wait, FIRST_EXCEPTION
+from concurrent.futures.process import BrokenProcessPool
+from heapq import merge, nsmallest
+from itertools import islice, accumulate
+from multiprocessing.shared_memory import SharedMemory
+
+from texpass.exceptions.exceptions import SearchCancelled
+from texpass.model.scoring import FuzzyScorer, SearchResult, _rank
+
+# seconds between checks for cancellation while waiting for workers
+CANCEL_CHECK_INTERVAL = 0.05
+
+# decoded shards a worker keeps, so a worker that gets the same shard again skips decoding it
+WORKER_SHARD_CACHE = 2
+
+_worker_shards: OrderedDict[tuple, list[str]] = OrderedDict()
+
+
+def _read_shard(name: str, start: int, end: int, lengths_end: int) -> list[str]:
+    """
+    Search strings of a shard of a shared memory block. Runs in a worker
+
+    The strings are stored joined between byte offsets start and end, 
+    followed by the length of each string in characters up to lengths_end
+    """
+    key = (name, start, end, lengths_end)
+
+    if key in _worker_shards:
+        _worker_shards.move_to_end(key)
+        return _worker_shards[key]
+
+    shared = SharedMemory(name = name)
+    try:
+        text = bytes(shared.buf[start:end]).decode()
+        lengths = array("q")
+        lengths.frombytes(shared.buf[end:lengths_end])
+    finally:
+        shared.close()
+
+    # lengths rather than a separator, as search strings can hold any character
+    ends = list(accumulate(lengths))
+    haystacks = [text[row_end - length:row_end] for row_end, length in zip(ends, lengths)]
+
+    _worker_shards[key] = haystacks
+    while len(_worker_shards) > WORKER_SHARD_CACHE:
+        _worker_shards.popitem(last = False)
+
+    return haystacks
+
+
+def _search_shard(
+        name: str, start: int, end: int, lengths_end: int, first_row: int, query: str, scorer, limit: int
+    ) -> list[tuple[int, float]]:
+    """
+    Best limit (row index, score) matches of a shard, best first. Runs in a worker
+    """
+    score_row = scorer.matcher(query)
+    matches = []
+
+    for index, haystack in enumerate(_read_shard(name, start, end, lengths_end), first_row):
+        score = score_row(haystack)
+
+        if score > 0:
+            matches.append((index, score))
+
+    return nsmallest(limit, matches, key = _rank)
+
+
+class Corpus:
+    """
+    Search strings of a table in a shared memory block, with where each shard is and its first row
+    """
+    def __init__(self, haystacks, shard_count: int, version):
+        self.version = version
+        self.shards: list[tuple[int, int, int, int]] = []
+        """(start, end, lengths end, first row) of each shard, see `_read_shard`"""
+
+        shard_size = -(-len(haystacks) // shard_count) if haystacks else 0
+        blobs = []
+        offset = 0
+
+        for first_row in range(0, len(haystacks), shard_size or 1):
+            shard = haystacks[first_row:first_row + shard_size]
+            text = "".join(shard).encode()
+            lengths = array("q", map(len, shard)).tobytes()
+
+            self.shards.append((offset, offset + len(text), offset + len(text) + len(lengths), first_row))
+            blobs += [text, lengths]
+            offset += len(text) + len(lengths)
+
+        # a block cannot be empty
+        self.memory = SharedMemory(create = True, size = max(offset, 1))
+        offset = 0
+
+        for blob in blobs:
+            self.memory.buf[offset:offset + len(blob)] = blob
+            offset += len(blob)
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+
+class ShardedSearch:
+    """
+    Search over every row, scored in parallel by a persistent pool of worker processes
+
+    Unlike IncrementalSearch, only the best `limit` matches are returned and no results are cached.
+    The shared corpus is made again when the rows change, which rows tells by their version
+    """
+    def __init__(self, workers: int, limit: int = 1000, scorer = None):
+        """
+        :param int workers: Worker processes, and shards the rows are split into
+        :param int limit: Most matches returned
+        :param scorer: How rows are matched and scored, `FuzzyScorer` if not given. Has to be picklable
+        """
+        self.workers = workers
+        self.limit = limit
+        self.scorer = scorer if scorer is not None else FuzzyScorer()
+
+        self._pool: ProcessPoolExecutor = None
+        self._corpus: Corpus = None
+
+    def clear(self):
+        # the corpus is checked against the version of the rows searched
+        pass
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawned, as forking a process running the UI's threads is unsafe
+            self._pool = ProcessPoolExecutor(self.workers, mp_context = multiprocessing.get_context("spawn"))
+            atexit.register(self.close)
+
+        return self._pool
+
+    def _get_corpus(self, rows, haystacks) -> Corpus:
+        version = getattr(rows, "version", None)
+
+        if self._corpus is None or version is None or self._corpus.version != version:
+            if self._corpus is not None:
+                self._corpus.close()
+
+            self._corpus = None
+            self._corpus = Corpus(haystacks, self.workers, version)
+
+        return self._corpus
+
+    def search(self, rows, query: str, is_cancelled = None, haystacks = None) -> SearchResult:
+        """
+        Search rows, returning the best `limit` rows that score above 0, best first
+
+        :param haystacks: Normalised search string of each row, see `IncrementalSearch.normalise`.
+            Rows are only copied to the workers when their version changes,
+            so pass the rows of `Table.rows` to reuse the shared corpus
+        """
+        if haystacks is None:
+            from texpass.model.table import IncrementalSearch
+
+            haystacks = [IncrementalSearch.normalise(IncrementalSearch.make_string(row)) for row in rows]
+
+        pool = self._get_pool()
+        corpus = self._get_corpus(rows, haystacks)
+
+        try:
+            futures = [
+                pool.submit(_search_shard, corpus.memory.name, start, end, lengths_end, first_row, query, self.scorer, self.limit)
+                for start, end, lengths_end, first_row in corpus.shards
+            ]
+        except RuntimeError:
+            # closed while searching, or a worker died
+            raise self._stopped(pool)
+
+        while True:
+            done, pending = wait(futures, timeout = CANCEL_CHECK_INTERVAL, return_when = FIRST_EXCEPTION)
+
+            if is_cancelled is not None and is_cancelled():
+                for future in pending:
+                    future.cancel()
+                raise SearchCancelled()
+
+            if not pending or any(future.cancelled() or future.exception() is not None for future in done):
+                break
+
+        if self._pool is not pool:
+            # closed while searching
+            raise SearchCancelled()
+
+        try:
+            results = [future.result() for future in futures]
+        except (CancelledError, BrokenProcessPool):
+            raise self._stopped(pool)
+
+        # each shard is ranked already, keep the best overall
+        best = list(islice(merge(*results, key = _rank), self.limit))
+        best.sort()
+
+        return SearchResult(rows, best)
+
+    def _stopped(self, pool: ProcessPoolExecutor) -> SearchCancelled:
+        """
+        SearchCancelled for a search whose pool was closed or broke while searching
+        """
+        if self._pool is pool:
+            # broken, a worker died. The next search starts new workers
+            self._pool = None
+            pool.shutdown(wait = False, cancel_futures = True)
+            atexit.unregister(self.close)
+
+        return SearchCancelled()
+
+    def close(self):
+        """
+        Stop the worker processes and free the shared corpus
+
+        Does not wait for the workers, so it can be called from the UI thread.
+        A search running meanwhile raises SearchCancelled
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait = False, cancel_futures = True)
+            self._pool = None
+            atexit.unregister(self.close)
+
+        if self._corpus is not None:
+            self._corpus.close()
+            self._corpus = None
@@ -1,5 +1,12 @@
-from textual.fuzzy import Matcher
-from texpass.exceptions.exceptions import InvalidArguments
+import sys
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from threading import Lock
+
+from texpass.exceptions.exceptions import InvalidArguments, SearchCancelled
+from texpass.helper.instrument import traced
+from texpass.model.scoring import FuzzyScorer, SubstringScorer, SearchResult
 
 
 class Columns:
@@ -70,75 +77,403 @@ class Columns:
             return 0
 
 
+def match_terms(records, query: str) -> list[tuple[str, str]]:
+    """
+    (website, username) of records containing every whitespace separated term of query, sorted by website
+
+    records end with website and username, like the (id, website, username) ones of `Account.get_all_records`.
+    Matching is done by `SubstringScorer`, so it needs neither Textual nor a populated Table
+    """
+    score = SubstringScorer().matcher(query)
+
+    return sorted(
+        (website, username) for *_, website, username in records
+        if score(f"{website} {username}".lower())
+    )
+
+
+class IncrementalSearch:
+    """
+    Search over every row that reuses results of recent queries
+
+    A row can only match a query if it matches every prefix of that query,
+    so when a query extends a cached one only the rows that matched before are rescored.
+    Backspacing to a cached query reuses its result directly.
+
+    Cached results must be cleared whenever the searched rows change. Rows with a version,
+    like those of `Table.rows`, also only get results cached for the same version
+    """
+    CANCEL_CHECK_ROWS = 512
+    """number of rows scored between checks for cancellation"""
+
+    def __init__(self, max_queries: int = 32, scorer = None):
+        """
+        :param scorer: How rows are matched and scored, `FuzzyScorer` if not given. See `texpass.model.scoring`
+        """
+        self.max_queries = max_queries
+        self.scorer = scorer if scorer is not None else FuzzyScorer()
+        self._cache: OrderedDict[str, list] = OrderedDict()
+        """maps query to its (row index, score) matches in row order, in least recently used order"""
+        self._generation = 0
+        """incremented on clear, so a search that was running during a change does not cache its result"""
+        self._version = None
+        """version of the rows the cached results are of, see `TableRows.version`"""
+        self._lock = Lock()
+
+    @staticmethod
+    def make_string(row: tuple) -> str:
+        """
+        Concatenate website and username of an (id, website, username) row as a string. For use in fuzzy matching
+
+        The ID is left out, it is not what the table shows for a row, see `TableController.display_rows`
+        """
+        _, website, username = row
+        return f"{website} {username}"
+
+    @staticmethod
+    def normalise(haystack: str) -> str:
+        """
+        Haystack as scorers are given it. The same object if it is already normalised, so it takes no extra memory
+        """
+        folded = haystack.lower()
+        return haystack if folded == haystack else folded
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._generation += 1
+
+    def _start(self, version) -> int:
+        """
+        Generation of the cache for a search of rows of this version. The cache is emptied if it is of other rows
+        """
+        with self._lock:
+            if version != self._version:
+                self._cache.clear()
+                self._generation += 1
+                self._version = version
+
+            return self._generation
+
+    def _get(self, query: str, generation: int):
+        with self._lock:
+            if generation == self._generation and query in self._cache:
+                self._cache.move_to_end(query)
+                return self._cache[query]
+
+    def _put(self, query: str, matches: list, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._cache[query] = matches
+            self._cache.move_to_end(query)
+
+            while len(self._cache) > self.max_queries:
+                self._cache.popitem(last = False)
+
+    def _candidates(self, row_count: int, query: str, generation: int):
+        """
+        Indexes of the rows that matched the longest cached prefix of query, or of all rows
+        """
+        for end in range(len(query) - 1, 0, -1):
+            cached = self._get(query[:end], generation)
+
+            if cached is not None:
+                return [index for index, _ in cached]
+
+        return range(row_count)
+
+    def search(self, rows, query: str, is_cancelled = None, haystacks = None) -> SearchResult:
+        """
+        Search rows, returning every row that scores above 0, best first
+
+        rows has to be a sequence that does not change during the search, as cached results refer to rows by index
+
+        :param is_cancelled: Optional callable, checked while scoring. 
+            Raises SearchCancelled if it returns True, nothing is cached in that case
+        :param haystacks: Optional sequence of the normalised strings to match for each row, see `normalise`.
+            Made from rows while searching if not given
+        """
+        generation = self._start(getattr(rows, "version", None))
+        matches = self._get(query, generation)
+
+        if matches is None:
+            matches = []
+            score_row = self.scorer.matcher(query)
+
+            # candidates keep the order of rows, so ties are ranked the same as a full search
+            for i, index in enumerate(self._candidates(len(rows), query, generation)):
+                if is_cancelled is not None and i % self.CANCEL_CHECK_ROWS == 0 and is_cancelled():
+                    raise SearchCancelled()
+
+                # get score
+                haystack = haystacks[index] if haystacks is not None else self.normalise(self.make_string(rows[index]))
+                score = score_row(haystack)
+
+                if score > 0:
+                    # append to result list in the format (row index, score) if score is higher than 0
+                    matches.append((index, score))
+
+            self._put(query, matches, generation)
+
+        # ranked lazily, as only the first matches are usually shown
+        return SearchResult(rows, matches)
+
+
+class IndexedSearch:
+    """
+    Search over candidates narrowed down by a database index, instead of over every row
+
+    Candidates are scored and ranked the same way as IncrementalSearch, so results match an in-memory
+    search as long as the best matches are among the candidates. Exact substring matches score highest
+    and are fetched first, which makes that the case for most queries
+    """
+    CANCEL_CHECK_ROWS = IncrementalSearch.CANCEL_CHECK_ROWS
+
+    def __init__(self, fetch_candidates, limit: int = 1000, scorer = None):
+        """
+        :param fetch_candidates: Callable taking query and limit, returning (id, website, username) rows
+        :param int limit: Most candidates scored per query
+        :param scorer: How candidates are matched and scored, `FuzzyScorer` if not given
+        """
+        self.fetch_candidates = fetch_candidates
+        self.limit = limit
+        self.scorer = scorer if scorer is not None else FuzzyScorer()
+
+    def clear(self):
+        # nothing is cached, the index is kept up to date by the database
+        pass
+
+    def search(self, rows, query: str, is_cancelled = None, haystacks = None) -> SearchResult:
+        """
+        Search candidates from the index. rows and haystacks are not used, they are there to match IncrementalSearch
+
+        Returns every candidate that scores above 0, best first
+        """
+        score_row = self.scorer.matcher(query)
+        # in ID order, so ties are ranked the same as an in-memory search
+        candidates = [tuple(row) for row in sorted(self.fetch_candidates(query, self.limit))]
+        matches = []
+
+        for index, row in enumerate(candidates):
+            if is_cancelled is not None and index % self.CANCEL_CHECK_ROWS == 0 and is_cancelled():
+                raise SearchCancelled()
+
+            score = score_row(IncrementalSearch.normalise(IncrementalSearch.make_string(row)))
+
+            if score > 0:
+                matches.append((index, score))
+
+        return SearchResult(candidates, matches)
+
+
+class TableRows:
+    """
+    Read only sequence of (id, website, username) rows over the columns of a Table, made on access
+    """
+    __slots__ = ("ids", "websites", "haystacks", "normalised", "version")
+
+    def __init__(self, ids: array, websites: list[str], haystacks: list[str], normalised: list[str] = None, version: int = None):
+        self.ids = ids
+        self.websites = websites
+        self.haystacks = haystacks
+        self.normalised = normalised
+        self.version = version
+        """`Table.version` the rows were copied at"""
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> tuple:
+        record_id = self.ids[index]
+        website = self.websites[index]
+        # haystacks are "website username", so the username is what follows the website
+        return (record_id, website, self.haystacks[index][len(website) + 1:])
+
+    def __iter__(self):
+        for index in range(len(self.ids)):
+            yield self[index]
+
+
 class Table:
     """
     Internal implementation of a table so it can be used to populate a Textual Datatable
 
-    Note that indexing within this table starts from 1, for readability
+    Rows are identified by the database ID of their entry, and kept in ID order.
+    They are stored as columns rather than a tuple per row: IDs in an array, websites deduplicated,
+    and usernames only as part of each row's search string. Search strings are made and normalised
+    once, when the row is added or edited
     """                
     def __init__(self):
         self.columns = Columns()
-        self.rows = []
-        
+        self.ids = array("q")
+        """ID of every row, ascending"""
+        self.websites: list[str] = []
+        """website of every row, one string object per distinct website"""
+        self.haystacks: list[str] = []
+        """search string of every row, see `IncrementalSearch.make_string`"""
+        self.normalised: list[str] = []
+        """search string of every row as scorers are given it, see `IncrementalSearch.normalise`"""
+        self._entries: dict[tuple[str, str], int] = None
+        """maps (website, username) to ID. Only made once it is needed"""
+        self.version = 0
+        """changes whenever rows are added, edited or removed"""
+        self._lock = Lock()
+        """held while the columns change or are copied, so a copy never has them misaligned"""
+        self.search = IncrementalSearch()
+        self.parallel_search = None
+        """search used instead of `search` once the table has parallel_search_rows rows, see `ShardedSearch`"""
+        self.parallel_search_rows = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _index(self, record_id: int) -> int:
+        """
+        Index of the row with this ID. Raises KeyError if there is none
+        """
+        index = bisect_left(self.ids, record_id)
+
+        if index == len(self.ids) or self.ids[index] != record_id:
+            raise KeyError(record_id)
+
+        return index
+
+    def rows(self) -> TableRows:
+        """
+        Rows of the table as they are now, with the version they are of. Later changes to the table do not affect it
+        """
+        with self._lock:
+            return TableRows(array("q", self.ids), list(self.websites), list(self.haystacks), list(self.normalised), self.version)
+
     def populate_table(self, pg_records: list[tuple]):
         """
-        Populates table from empty
+        Populates table from empty, with (id, website, username) records in ID order
         """
-        self.rows = []
+        ids = array("q")
+        websites = []
+        haystacks = []
+        normalised = []
+
+        for record_id, website, username in pg_records:
+            haystack = IncrementalSearch.make_string((record_id, website, username))
 
-        for i, record in enumerate(pg_records, 1):
-            self.rows.append((i, *record))
+            ids.append(record_id)
+            websites.append(sys.intern(website))
+            haystacks.append(haystack)
+            normalised.append(IncrementalSearch.normalise(haystack))
+
+        with self._lock:
+            self.ids, self.websites, self.haystacks, self.normalised = ids, websites, haystacks, normalised
+            self._entries = None
+            self.search.clear()
+            self.version += 1
 
     def generator(self):
         """
         Returns a generator to iterate through when adding rows in table UI
         """
-        for row in self.rows:
-            yield row
+        return iter(TableRows(self.ids, self.websites, self.haystacks))
     
     def get_key(self, row: tuple) -> str:
         # hardcoded ID column index
         return str(row[0])
+
+    def get_row(self, record_id: int) -> tuple:
+        """
+        (id, website, username) of the row with this ID, or None if there is none
+        """
+        try:
+            return TableRows(self.ids, self.websites, self.haystacks)[self._index(record_id)]
+        except KeyError:
+            return None
+
+    def get_record_id(self, website: str, username: str) -> int:
+        """
+        Get ID of the row with this website and username, or None if there is none
+        """
+        if self._entries is None:
+            self._entries = {(row_website, row_username): record_id for record_id, row_website, row_username in self.generator()}
+
+        return self._entries.get((website, username))
     
-    def get_fuzzied_records(self, query: str) -> list[tuple[tuple, int]]:
+    @traced("table.get_fuzzied_records")
+    def get_fuzzied_records(self, query: str, is_cancelled = None) -> SearchResult:
         """
-        Do fuzzy search on all records
+        Search all records
+
+        Returns (row, score) of all scores greater than 0, best first. Only the part that is read gets ranked
+        Large tables searched by parallel_search only return its best `limit` rows
 
-        Returns sorted by descending order, all scores greater than 0
+        Raises SearchCancelled if is_cancelled is given and returns True during the search
         """
-        def make_string(row):
-            """Concatenate cells of a row as a string. For use in fuzzy matching"""
-            return " ".join([str(cell) for cell in row])
-        
-        result = []
+        # copied, as rows can change while searching in a worker
+        rows = self.rows()
+        search = self.search
 
-        matcher = Matcher(query)
-        
-        for row in self.rows:
-            # get score
-            score = matcher.match(make_string(row))
+        if self.parallel_search is not None and len(rows) >= self.parallel_search_rows:
+            search = self.parallel_search
 
-            if score > 0:
-                # append to result list in the format ((id, website, username), score)
-                # ... if score is higher than 0
-                result.append((row, score))
-            
-        # sort in descending order by score
-        return sorted(result, key = lambda x: x[-1], reverse = True)
+        return search.search(rows, query, is_cancelled, rows.normalised)
     
-    def add_record(self, website: str, username: str) -> int:
+    def add_record(self, record_id: int, website: str, username: str) -> int:
         """
-        Appends new row to the table
+        Adds new row to the table. New entries have the highest ID, so this appends
 
         Returns ID of the new row
         """
-        last = len(self.rows) + 1
-        self.rows.append((last, website, username))
+        haystack = IncrementalSearch.make_string((record_id, website, username))
+
+        with self._lock:
+            index = bisect_left(self.ids, record_id)
+
+            self.ids.insert(index, record_id)
+            self.websites.insert(index, sys.intern(website))
+            self.haystacks.insert(index, haystack)
+            self.normalised.insert(index, IncrementalSearch.normalise(haystack))
+            self.search.clear()
+            self.version += 1
 
-        return last
+        if self._entries is not None:
+            self._entries[(website, username)] = record_id
+
+        return record_id
     
     def edit_record(self, record_id: int, website: str, username: str):
         """
         Sets the values for a record in the table, based on id
         """
-        self.rows[record_id - 1] = (record_id, website, username)
\ No newline at end of file
+        index = self._index(record_id)
+
+        if self._entries is not None:
+            _, old_website, old_username = self.get_row(record_id)
+            del self._entries[(old_website, old_username)]
+            self._entries[(website, username)] = record_id
+
+        haystack = IncrementalSearch.make_string((record_id, website, username))
+
+        with self._lock:
+            self.websites[index] = sys.intern(website)
+            self.haystacks[index] = haystack
+            self.normalised[index] = IncrementalSearch.normalise(haystack)
+            self.search.clear()
+            self.version += 1
+
+    def delete_record(self, record_id: int):
+        """
+        Removes a record from the table, based on id
+        """
+        index = self._index(record_id)
+
+        if self._entries is not None:
+            _, website, username = self.get_row(record_id)
+            del self._entries[(website, username)]
+
+        with self._lock:
+            del self.ids[index]
+            del self.websites[index]
+            del self.haystacks[index]
+            del self.normalised[index]
+            self.search.clear()
+            self.version += 1
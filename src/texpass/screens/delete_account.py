@@ -2,6 +2,8 @@ from textual.containers import Vertical, Horizontal
 from textual.widgets import Button, Static
 from textual.screen import ModalScreen
 from textual.app import ComposeResult
+from textual.worker import get_current_worker
+from textual import work
 
 from texpass.helper.account import Account
 from texpass.widgets.submit_input import SubmitInput
@@ -10,13 +12,21 @@ class DeleteController:
     def __init__(self, account: Account):
         self.account = account
 
-    def delete_account(self, input_password: str) -> bool:
-        if self.account.verify_password(input_password):
-            self.account.delete_account()
-            return True
-        else:
+    def delete_account(self, input_password: str, is_cancelled = None) -> bool:
+        """
+        Delete the account if input_password is its master password. Blocking, as it hashes the password
+
+        Nothing is deleted if is_cancelled returns True once the password is checked
+        """
+        if not self.account.verify_password(input_password):
             return False
 
+        if is_cancelled is not None and is_cancelled():
+            return False
+
+        self.account.delete_account()
+        return True
+
 
 class DeleteAccountScreen(ModalScreen):
     """
@@ -43,12 +53,29 @@ class DeleteAccountScreen(ModalScreen):
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id == "submit":
-            result = self.controller.delete_account(self.query_one(SubmitInput).value)
-            
-            if result:
-                self.screen.dismiss(result)
-            else:
-                self.query_one("#status", Static).update("Wrong password entered")
+            # disabled until the password is checked, so it is not submitted twice
+            event.button.disabled = True
+            self.query_one("#status", Static).update("Checking password…")
+            self.delete_account(self.query_one(SubmitInput).value)
             
         elif event.button.id == "cancel":
+            self.workers.cancel_group(self, "delete")
             self.screen.dismiss(False)
+
+    @work(thread=True, exclusive=True, group="delete")
+    def delete_account(self, password: str):
+        """
+        Check the password and delete in a worker thread, as hashing would block the UI
+        """
+        worker = get_current_worker()
+        result = self.controller.delete_account(password, lambda: worker.is_cancelled)
+
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self.finish_delete, result)
+
+    def finish_delete(self, result: bool):
+        if result:
+            self.screen.dismiss(result)
+        else:
+            self.query_one("#submit", Button).disabled = False
+            self.query_one("#status", Static).update("Wrong password entered")
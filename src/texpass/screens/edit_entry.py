@@ -62,8 +62,6 @@ class EditEntryScreen(ModalScreen):
         try:
             self.controller.edit_entry(
                 self.record_id,
-                self.old_username,
-                self.old_website,
                 username,
                 website,
                 password
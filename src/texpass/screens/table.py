@@ -2,6 +2,7 @@ from textual.screen import Screen
 from textual.app import ComposeResult
 from textual.widgets import Footer
 from textual.binding import Binding
+from textual import events
 
 from texpass.widgets.data_table import MyTable
 from texpass.widgets.search_input import SearchInput
@@ -12,6 +13,9 @@ from texpass.controller.table_controller import TableController
 
 class TableScreen(Screen):
 
+    IDLE_CHECK_INTERVAL = 5
+    """seconds between checks for an idle session"""
+
     CSS_PATH = "../styles/main_screen.tcss"
 
     BINDINGS = [
@@ -36,6 +40,26 @@ class TableScreen(Screen):
         yield self.table
         yield Footer(show_command_palette=False)
 
+    def on_mount(self):
+        self.set_interval(self.IDLE_CHECK_INTERVAL, self.check_idle)
+
+    def on_key(self, event: events.Key):
+        self.controller.touch()
+
+    def check_idle(self) -> None:
+        """
+        Log out if the session key has been idle for too long
+
+        Screens open on top of this one are closed first, as they can show a decrypted password
+        """
+        if self not in self.app.screen_stack or not self.controller.is_idle():
+            return
+
+        while self.app.screen is not self:
+            self.app.pop_screen()
+
+        self.action_logout()
+
     def on_my_table_fuzzied(self, message: MyTable.Fuzzied):
         self.table.show_fuzzy_result(message)
 
@@ -56,7 +80,9 @@ class TableScreen(Screen):
         self.table.delete_cursor_row()
 
     def action_logout(self) -> None:
+        self.controller.lock()
         self.screen_switcher.to_login()
 
     def action_delete_profile(self) -> None:
-        self.screen_switcher.push_delete()
+        # the deleted account is logged out like any other, so its cached passwords and search workers are freed
+        self.screen_switcher.push_delete(self.action_logout)
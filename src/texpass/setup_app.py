@@ -1,25 +1,170 @@
 import sqlite3
 
+from texpass.helper.storage import PASSWORDS_DATABASE
 
-def setup_database():
+
+def create_tables(con: sqlite3.Connection):
     # Create login table; Store login info; Create password table
-    con = sqlite3.connect('passwords.db')
-    
-    with con:
-        con.execute("""CREATE TABLE IF NOT EXISTS user_login (
-            account_name TEXT PRIMARY KEY,
-            password_hash TEXT NOT NULL,
-            salt TEXT
-            );""")
-        
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS passwords (
-                account_name TEXT,
-                username TEXT,
-                website TEXT,
-                encrypted_password TEXT,
-
-                PRIMARY KEY (account_name, username, website)
-            );""")
-
-    con.close()
+    con.execute("""CREATE TABLE IF NOT EXISTS user_login (
+        account_name TEXT PRIMARY KEY,
+        password_hash TEXT NOT NULL,
+        salt TEXT
+        );""")
+
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS passwords (
+            account_name TEXT,
+            username TEXT,
+            website TEXT,
+            encrypted_password TEXT,
+
+            PRIMARY KEY (account_name, username, website)
+        );""")
+
+
+def add_entry_ids(con: sqlite3.Connection):
+    """
+    Rebuild the passwords table with an integer ID, keeping existing entries in the order they were added
+    """
+    con.execute("""
+        CREATE TABLE passwords_new (
+            id INTEGER PRIMARY KEY,
+            account_name TEXT,
+            username TEXT,
+            website TEXT,
+            encrypted_password TEXT,
+
+            UNIQUE (account_name, username, website)
+        );""")
+
+    con.execute("""
+        INSERT INTO passwords_new (account_name, username, website, encrypted_password)
+            SELECT account_name, username, website, encrypted_password FROM passwords ORDER BY rowid;""")
+
+    con.execute("DROP TABLE passwords;")
+    con.execute("ALTER TABLE passwords_new RENAME TO passwords;")
+
+    # entries of an account, sorted by website
+    con.execute("CREATE INDEX passwords_account_website ON passwords (account_name, website, username);")
+
+
+def add_kdf_params(con: sqlite3.Connection):
+    """
+    Store the Argon2 parameters of each account. Existing accounts keep NULL until they are upgraded at login
+    """
+    for column in ("time_cost", "memory_cost", "parallelism"):
+        con.execute(f"ALTER TABLE user_login ADD COLUMN {column} INTEGER;")
+
+
+def add_entry_numbers(con: sqlite3.Connection):
+    """
+    Number the entries of each account from 1, in the order they were added. The table shows this number,
+    as IDs are shared by every account
+    """
+    con.execute("ALTER TABLE passwords ADD COLUMN number INTEGER;")
+
+    con.execute("CREATE TEMP TABLE entry_numbers (id INTEGER PRIMARY KEY, number INTEGER);")
+    con.execute("""
+        INSERT INTO entry_numbers (id, number)
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY account_name ORDER BY id) FROM passwords;""")
+    con.execute("UPDATE passwords SET number = (SELECT number FROM entry_numbers WHERE entry_numbers.id = passwords.id);")
+    con.execute("DROP TABLE entry_numbers;")
+
+    con.execute("CREATE UNIQUE INDEX passwords_account_number ON passwords (account_name, number);")
+
+
+def create_search_index(con: sqlite3.Connection):
+    """
+    Trigram full text index over website and username of every entry, kept in sync with triggers
+    """
+    con.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS passwords_fts USING fts5 (
+            website, username, content = 'passwords', content_rowid = 'id', tokenize = 'trigram'
+        );""")
+
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_insert AFTER INSERT ON passwords BEGIN
+            INSERT INTO passwords_fts (rowid, website, username) VALUES (new.id, new.website, new.username);
+        END;""")
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_delete AFTER DELETE ON passwords BEGIN
+            INSERT INTO passwords_fts (passwords_fts, rowid, website, username)
+                VALUES ('delete', old.id, old.website, old.username);
+        END;""")
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_update AFTER UPDATE OF website, username ON passwords BEGIN
+            INSERT INTO passwords_fts (passwords_fts, rowid, website, username)
+                VALUES ('delete', old.id, old.website, old.username);
+            INSERT INTO passwords_fts (rowid, website, username) VALUES (new.id, new.website, new.username);
+        END;""")
+
+    # index entries that existed before
+    con.execute("INSERT INTO passwords_fts (passwords_fts) VALUES ('rebuild');")
+
+
+def add_search_index(con: sqlite3.Connection):
+    """
+    Create the search index if this SQLite can. It is optional, as it needs FTS5 with the trigram tokenizer
+    """
+    con.execute("SAVEPOINT search_index;")
+
+    try:
+        create_search_index(con)
+    except sqlite3.OperationalError:
+        # no FTS5, or no trigram tokenizer. Searching falls back to the in-memory search
+        con.execute("ROLLBACK TO search_index;")
+
+    con.execute("RELEASE search_index;")
+
+
+MIGRATIONS = [create_tables, add_entry_ids, add_kdf_params, add_entry_numbers, add_search_index]
+"""schema changes in order. A database at version n has had the first n applied"""
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def setup_database(path: str = PASSWORDS_DATABASE):
+    """
+    Create the database, or bring an existing one up to the current schema
+
+    The schema version is kept in `PRAGMA user_version`, so an up to date database is only read once.
+    All pending migrations run in a single transaction
+    """
+    con = sqlite3.connect(path, isolation_level=None)
+
+    try:
+        version = con.execute("PRAGMA user_version;").fetchone()[0]
+
+        if version == SCHEMA_VERSION:
+            return
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"Database schema version {version} is newer than this version of texpass supports")
+
+        con.execute("BEGIN IMMEDIATE;")
+        try:
+            # another process may have migrated it while this one waited for the lock
+            version = con.execute("PRAGMA user_version;").fetchone()[0]
+
+            for migration in MIGRATIONS[version:]:
+                migration(con)
+
+            con.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+        except BaseException:
+            con.execute("ROLLBACK;")
+            raise
+        else:
+            con.execute("COMMIT;")
+    finally:
+        con.close()
+
+
+def has_search_index(path: str = PASSWORDS_DATABASE) -> bool:
+    """
+    Check if the database has the search index, see `add_search_index`
+    """
+    con = sqlite3.connect(path, isolation_level=None)
+
+    try:
+        return con.execute("SELECT 1 FROM sqlite_master WHERE name = 'passwords_fts';").fetchone() is not None
+    finally:
+        con.close()
@@ -1,24 +1,28 @@
-from textual.app import App
-
-from texpass.controller.screen_controller import ScreenController
-
-
-class MainApp(App):
-
-    def on_mount(self):
-        ScreenController(self).push_login()
+import sys
 
 
 def main():
     """
     Creates the App and runs it
+
+    If a command is given, runs that from the command line instead
     """
+    if len(sys.argv) > 1:
+        from texpass.cli import main as cli_main
+
+        sys.exit(cli_main(sys.argv[1:]))
+
     from texpass import setup_app
+    from texpass.app import MainApp
+    from texpass.helper.storage import close_storage
 
     setup_app.setup_database()
 
     app = MainApp()
-    app.run()
+    try:
+        app.run()
+    finally:
+        close_storage()
 
 if __name__ == "__main__":
     main()
@@ -1,14 +1,18 @@
 from textual.widgets import DataTable
-from textual import events
+from textual import events, work
+from textual.worker import get_current_worker
+from textual.timer import Timer
 from textual.message import Message
-from textual.widgets.data_table import RowDoesNotExist, ColumnKey
+from textual.widgets.data_table import RowDoesNotExist, CellDoesNotExist, ColumnKey, RowKey
+from textual.coordinate import Coordinate
 from textual.geometry import Size
 
-from texpass.screens.confirm import ConfirmScreen
-from texpass.screens.edit_entry import EditEntryScreen
 from texpass.controller.table_controller import TableController
 from texpass.helper.timed_string import TimeString
 from texpass.widgets.search_input import SearchInput
+from texpass.exceptions.exceptions import SearchCancelled
+from texpass.model.row_diff import RowDiff
+from texpass.helper.instrument import traced
 
 class MyTable(DataTable):
     class Fuzzied(Message):
@@ -22,14 +26,37 @@ class MyTable(DataTable):
         ("left", "page_up", "Move one page up")
     ]
 
-    def __init__(self, controller: TableController):
+    SEARCH_DEBOUNCE = 0.15
+    """default seconds to wait after the last keystroke before searching"""
+
+    EDGE_ROWS = 20
+    """load another page when the cursor gets this close to the first or last loaded row"""
+
+    RESULT_PAGE_ROWS = 200
+    """search results shown at first, and added each time the cursor gets close to the last one shown"""
+
+    MAX_ROWS_REMOVED = 50
+    """most rows removed one at a time when showing new rows, as DataTable.remove_row moves every row after it"""
+
+    def __init__(self, controller: TableController, search_debounce: float = SEARCH_DEBOUNCE):
         self.controller = controller
         self.digit_presses = TimeString(400 * 10**6)
 
+        self.search_debounce = search_debounce
+        self.latest_query = ""
+        """query of the most recent Fuzzied message. Only its result is shown"""
+        self.shown_query = ""
+        """query whose result the table shows, "" when it shows the loaded rows"""
+        self.search_result = None
+        """result of shown_query, of which the best result_rows_shown rows are shown"""
+        self.result_rows_shown = 0
+        self.search_timer: Timer = None
+
         super().__init__(cursor_type="row", zebra_stripes=True, header_height=2)
 
     def on_mount(self):
-        self.controller.populate_internal_table()
+        # only the first page is read, so this takes the same time however many entries there are
+        self.controller.load_first_page()
         self.add_columns()
         self.fill_table()
 
@@ -98,36 +125,204 @@ class MyTable(DataTable):
         for column in self.columns_.columns:
             super().add_column(column.column_name, key = column.column_name)
 
+    @traced("ui.fill_table")
     def fill_table(self):
         """
-        Adds all DataTable rows. Requires a populated internal table
+        Shows the loaded rows of the controller's window, in website order
 
-        Note that this does not clear the table or add columns
+        Note that this does not add columns
         """
-        rows = self.controller.generate_rows()
-        
-        for row, key in rows:
-            self.add_row(*row, key = key)
+        self.show_rows(self.controller.generate_window_rows())
+
+    def on_data_table_row_highlighted(self, message: DataTable.RowHighlighted):
+        if not self.latest_query:
+            self.load_near_cursor()
+        elif self.shown_query == self.latest_query:
+            self.show_more_results()
+
+    @traced("ui.load_near_cursor")
+    def load_near_cursor(self) -> None:
+        """
+        Load the next or previous page if the cursor is close to the last or first loaded row
+
+        The cursor keeps its place on screen while rows are added or dropped above it
+        """
+        window = self.controller.window
+
+        if self.cursor_row >= self.row_count - self.EDGE_ROWS and not window.at_end:
+            self.controller.load_next_page()
+        elif self.cursor_row < self.EDGE_ROWS and not window.at_start:
+            self.controller.load_previous_page()
+        else:
+            return
+
+        screen_offset = self.cursor_row - self.scroll_y
+        self.fill_table()
+        # the new rows are only measured on the next refresh, scrolling before then would be clamped
+        self.call_after_refresh(self.scroll_to, y = max(self.cursor_row - screen_offset, 0), animate = False)
+
+    @traced("ui.show_more_results")
+    def show_more_results(self) -> None:
+        """
+        Show the next page of the search result if the cursor is close to the last result shown
+        """
+        if self.search_result is None or self.cursor_row < self.row_count - self.EDGE_ROWS:
+            return
+        if self.result_rows_shown >= len(self.search_result):
+            return
+
+        self.result_rows_shown += self.RESULT_PAGE_ROWS
+        # rows already shown are kept, the new ones are appended
+        self.show_rows(self.controller.generate_result_rows(self.search_result, self.result_rows_shown))
+
+    def show_record(self, record_id: int) -> None:
+        """
+        Load the rows around an entry and move the cursor to it, e.g. after it was added or edited
+        """
+        self.controller.reload_window(record_id)
+        self.fill_table()
+
+        try:
+            self.move_cursor(row = self.get_row_index(str(record_id)))
+        except RowDoesNotExist:
+            pass
+
+    def cursor_record_id(self) -> int:
+        """
+        ID of the entry at the cursor. The ID column shows its number, the ID is the key of its row
+        """
+        row_key, _ = self.coordinate_to_cell_key(Coordinate(self.cursor_row, 0))
+        return int(row_key.value)
+
+    def ordered_keys(self) -> list[RowKey]:
+        """
+        Keys of the rows as they currently appear
+        """
+        return [row.key for row in self.ordered_rows]
+
+    @traced("ui.show_rows")
+    def show_rows(self, records) -> None:
+        """
+        Make the table show exactly these (row, key) records, in this order
+
+        Only rows that have to be removed, added, moved or changed are touched,
+        unless so many rows are removed that showing every row again is quicker.
+        The cursor stays on the same row if it is still shown
+        """
+        records = list(records)
+        old_keys = self.ordered_keys()
+        diff = RowDiff([row_key.value for row_key in old_keys], [key for _, key in records])
+
+        cursor_key = old_keys[self.cursor_row] if 0 <= self.cursor_row < len(old_keys) else None
+
+        rebuilt = len(diff.removed) > self.MAX_ROWS_REMOVED
+
+        if rebuilt:
+            self.clear()
 
+            for record, key in records:
+                self.add_row(*record, key = key)
+        else:
+            self.update_rows(records, diff)
+
+        if cursor_key is not None and cursor_key in self.rows:
+            # clearing scrolled back to the top
+            self.move_cursor(row = self.get_row_index(cursor_key), scroll = rebuilt)
+
+    def update_rows(self, records: list, diff: RowDiff) -> None:
+        """
+        Apply diff to the shown rows, see `show_rows`
+        """
+        for key in diff.removed:
+            self.remove_row(key)
+
+        column_keys = [column.key for column in self.ordered_columns]
+
+        # kept rows can have new values, e.g. after an edit
+        for record, key in records:
+            if key in self.rows:
+                for column_key, old_value, new_value in zip(column_keys, self.get_row(key), record):
+                    if old_value != new_value:
+                        self.update_cell(key, column_key, new_value, update_width = True)
+
+        added = set(diff.added)
+
+        for record, key in records:
+            if key in added:
+                self.add_row(*record, key = key)
+
+        if not diff.appended_in_order:
+            # the values of a row are unique, as website and username are unique in an account
+            position = {tuple(record): index for index, (record, _) in enumerate(records)}
+            self.sort(key = lambda values: position[values])
+
+    @traced("ui.show_fuzzy_result")
     def show_fuzzy_result(self, message: Fuzzied):
         """
         Update table records based on new fuzzy search
 
+        The search runs in a worker once no new query has arrived for the debounce window.
+        Pending and running searches for older queries are cancelled
+
         If empty, shows all records
         """
-        # clear table
-        self.clear()
+        self.latest_query = message.query
+
+        if self.search_timer is not None:
+            self.search_timer.stop()
+            self.search_timer = None
+
+        self.workers.cancel_group(self, "search")
 
         # if query is not ""
         if message.query:
-            fuzzied_records = self.controller.generate_fuzzied_rows(message.query)
+            self.search_timer = self.set_timer(self.search_debounce, lambda: self.search(message.query))
         else:
             # since there is no search, display all records
             self.fill_table()
+            self.shown_query = ""
+
+    def refresh_search(self) -> None:
+        """
+        Search again after entries were added, edited or deleted, showing as many results as before
+
+        The result shown so far was searched before the change, so no more rows are read from it
+        """
+        self.search_result = None
+        self.search(self.latest_query, max(self.result_rows_shown, self.RESULT_PAGE_ROWS))
+
+    @work(thread=True, exclusive=True, group="search")
+    def search(self, query: str, rows: int = None):
+        """
+        Fuzzy search in a worker thread, then hand the result to the event loop
+
+        :param int rows: Results to show, the first page if not given
+        """
+        worker = get_current_worker()
+        rows = rows if rows is not None else self.RESULT_PAGE_ROWS
+
+        try:
+            result = self.controller.search(query, lambda: worker.is_cancelled)
+            # only the first page is ranked and shown, more are shown when scrolling down
+            fuzzied_records = list(self.controller.generate_result_rows(result, rows))
+        except SearchCancelled:
             return
-        
-        for record, key in fuzzied_records:
-            self.add_row(*record, key = key)
+
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self.apply_fuzzy_result, query, result, fuzzied_records)
+
+    @traced("ui.apply_fuzzy_result")
+    def apply_fuzzy_result(self, query: str, result, fuzzied_records: list[tuple]):
+        """
+        Show the first page of a search result, unless a newer query has arrived since
+        """
+        if query != self.latest_query:
+            return
+
+        self.show_rows(fuzzied_records)
+        self.shown_query = query
+        self.search_result = result
+        self.result_rows_shown = len(fuzzied_records)
 
     def add_new_row(self, id: int, website: str, username: str):
         """
@@ -135,25 +330,39 @@ class MyTable(DataTable):
         
         Note that this does not commit to database. Use controller for that.
         """
-        self.add_row(id, website, username, key = str(id))
+        if self.latest_query:
+            # shown if it matches the query, and once the search is cleared
+            self.controller.reload_window()
+            self.refresh_search()
+        else:
+            # show it where it belongs in website order
+            self.show_record(id)
 
     def edit_cursor_row(self) -> None:
         """Edit entry at cursor row"""
         if self.row_count < 1:
             return
         try:
-            record_id, website, username = self.get_row_at(self.cursor_row)
-            raw_password = self.controller.get_password_at(username, website)
-        except RowDoesNotExist:
+            _, website, username = self.get_row_at(self.cursor_row)
+            record_id = self.cursor_record_id()
+            raw_password = self.controller.get_password_at(record_id)
+        except (RowDoesNotExist, CellDoesNotExist):
             return
 
         def process_edit(record: dict):
             """
             3 entries: edited: bool, website: str, username: str
             """
-            if record['edited']:
+            if record['edited'] and not self.latest_query:
+                # the entry may have moved in website order
+                self.show_record(record_id)
+            elif record['edited']:
                 self.update_cell(str(record_id), self.columns_.get_column_name("website"), record['website'], update_width = True)
                 self.update_cell(str(record_id), self.columns_.get_column_name("username"), record['username'], update_width = True)
+                self.controller.reload_window()
+                self.refresh_search()
+
+        from texpass.screens.edit_entry import EditEntryScreen
 
         self.app.push_screen(EditEntryScreen(self.controller, record_id, username, website, raw_password), process_edit)
 
@@ -164,11 +373,11 @@ class MyTable(DataTable):
         if self.row_count < 1:
             return
         try:
-            _, website, username = self.get_row_at(self.cursor_row)
-        except RowDoesNotExist:
+            record_id = self.cursor_record_id()
+        except CellDoesNotExist:
             return
         
-        self.controller.copy_password_at(username, website)
+        self.controller.copy_password_at(record_id)
         self.notify("Password has been copied", title="Copy successful", timeout=3)
 
     def delete_cursor_row(self) -> None:
@@ -176,35 +385,48 @@ class MyTable(DataTable):
         if self.row_count < 1:
             return
         try:
-            _, website, username = self.get_row_at(self.cursor_row)
-        except RowDoesNotExist:
+            record_id = self.cursor_record_id()
+        except CellDoesNotExist:
             return
 
         def process_delete(confirmed: bool):
             if confirmed:
                 # delete entry from database
-                self.controller.delete_entry(username, website)
-                # fill table from scratch
-                self.clear()
-                self.fill_table()
+                self.controller.delete_entry(record_id)
+                self.remove_row(str(record_id))
+                # fill the gap it left in the window, also when it is only shown after the search is cleared
+                self.controller.reload_window()
+
+                if not self.latest_query:
+                    self.fill_table()
+                else:
+                    self.refresh_search()
     
         # this currently works without screen_switcher as this is a simple true/false return
+        from texpass.screens.confirm import ConfirmScreen
+
         self.app.push_screen(ConfirmScreen(), process_delete)
 
     def _on_key(self, event: events.Key):
         # move to a specific index
         # can move to double digit index cells within 400 ms
         if event.character in ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9"]:
-            # rown as in row number
-            id_key = self.digit_presses.send(event.character)
+            # number shown in the ID column
+            number = self.digit_presses.send(event.character)
+            record_id = self.controller.get_entry_id(int(number))
+
+            if record_id is None:
+                return
 
             # move cursor to final number
             try:
                 # move to row index from ID (key)
-                row_index = self.get_row_index(id_key)
+                row_index = self.get_row_index(str(record_id))
                 self.move_cursor(row = row_index)
             except RowDoesNotExist:
-                pass
+                # the entry may be outside the loaded rows
+                if not self.latest_query:
+                    self.show_record(record_id)
         # is a character, type it to Input
         elif event.is_printable:
             inp = self.parent.query_one("Input", SearchInput)
@@ -1,11 +1,13 @@
 from textual.app import ComposeResult
 from textual.containers import Vertical
 from textual.widgets import Button, Static
-from textual import on
+from textual.worker import get_current_worker
+from textual import on, work
 
 from texpass.widgets.submit_input import SubmitInput
 from texpass.controller.login import LoginController
 from texpass.helper.switch_message import Switch
+from texpass.helper.status import Status
 
 
 class VerticalButtons(Vertical):
@@ -17,21 +19,51 @@ class VerticalButtons(Vertical):
     def __init__(self, controller: LoginController, add_msg: Static):
         self.msg_widget = add_msg
         self.controller = controller
+        self.unlocking = False
+        # incremented on every attempt, so results of cancelled attempts can be told apart
+        self.attempt = 0
         super().__init__()
 
     def compose(self) -> ComposeResult:
         yield Button("Login",id="login_button", classes="submit elements")
         yield Button("Create account", id="register_button", classes="elements")
+        yield Button("Cancel", id="cancel_button", classes="elements")
 
     @on(Button.Pressed, "#register_button")
     def on_register(self):
         self.post_message(Switch(switch_else=True))
 
+    @on(Button.Pressed, "#cancel_button")
+    def on_cancel(self):
+        """
+        Stop waiting for the current login attempt
+
+        The hashing itself cannot be interrupted, so its result is discarded when it finishes
+        """
+        self.workers.cancel_group(self, "unlock")
+        self.attempt += 1
+        self.set_unlocking(False)
+        self.msg_widget.update("Login cancelled")
+
+    def set_unlocking(self, unlocking: bool):
+        """
+        Toggle the unlocking state, where login and register buttons are disabled
+        """
+        self.unlocking = unlocking
+        self.set_class(unlocking, "-unlocking")
+
+        self.query_one("#login_button", Button).disabled = unlocking
+        self.query_one("#register_button", Button).disabled = unlocking
+
     def field_empty(self, value: str) -> bool:
         return value.strip() == ""
 
     @on(Button.Pressed, "#login_button")
     def on_login(self):        
+        # guard against submitting again while still unlocking
+        if self.unlocking:
+            return
+
         # getting inputs and storing them
         for input_ in self.parent.query("SubmitInput").results(SubmitInput):
             # empty field check
@@ -49,7 +81,28 @@ class VerticalButtons(Vertical):
                 password = input_.value
                 break
         
+        self.attempt += 1
+        self.set_unlocking(True)
+        self.msg_widget.update("Unlocking…")
+
+        self.log_in(username, password, self.attempt)
+
+    @work(thread=True, exclusive=True, group="unlock")
+    def log_in(self, username: str, password: str, attempt: int):
+        """
+        Verify login details in a worker thread, as hashing would block the UI
+        """
         login_status = self.controller.log_in(username, password)
+
+        if not get_current_worker().is_cancelled:
+            self.app.call_from_thread(self.finish_login, login_status, attempt)
+
+    def finish_login(self, login_status: Status, attempt: int):
+        # attempt was cancelled after the worker finished
+        if attempt != self.attempt:
+            return
+
+        self.set_unlocking(False)
         self.msg_widget.update(login_status.message)
 
         if login_status.status:
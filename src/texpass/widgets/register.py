@@ -1,11 +1,13 @@
 from textual.containers import Vertical
 from textual.widgets import Button, Static
-from textual import on
+from textual.worker import get_current_worker
+from textual import on, work
 from textual.app import ComposeResult
 
 from texpass.widgets.submit_input import SubmitInput
 from texpass.controller.register import RegisterController
 from texpass.helper.switch_message import Switch
+from texpass.helper.status import Status
 
 
 class VerticalButtons(Vertical):
@@ -16,6 +18,9 @@ class VerticalButtons(Vertical):
     """
     def __init__(self, msg_widget: Static):
         self.msg_widget = msg_widget
+        self.registering = False
+        # incremented on every attempt, so results of cancelled attempts can be told apart
+        self.attempt = 0
         super().__init__()
         
     BINDINGS = [
@@ -29,6 +34,7 @@ class VerticalButtons(Vertical):
     def compose(self) -> ComposeResult:
         yield Button("Register",id="register_button", classes="submit elements")
         yield Button("Back", id="back_button", classes = "elements")
+        yield Button("Cancel", id="cancel_button", classes = "elements")
 
     def field_empty(self, value: str) -> bool:
         return value.strip() == ""
@@ -38,9 +44,34 @@ class VerticalButtons(Vertical):
         # switch to login
         self.post_message(Switch(switch_else=True))
 
+    @on(Button.Pressed, "#cancel_button")
+    def on_cancel(self):
+        """
+        Stop the current register attempt
+
+        The hashing itself cannot be interrupted, the worker does not save the account once it is done
+        """
+        self.workers.cancel_group(self, "unlock")
+        self.attempt += 1
+        self.set_registering(False)
+        self.__send_update("Registering cancelled")
+
+    def set_registering(self, registering: bool):
+        """
+        Toggle the registering state, where register and back buttons are disabled
+        """
+        self.registering = registering
+        self.set_class(registering, "-unlocking")
+
+        self.query_one("#register_button", Button).disabled = registering
+        self.query_one("#back_button", Button).disabled = registering
+
     @on(Button.Pressed, "#register_button")
     def on_register(self):
-        controller = RegisterController()
+        # guard against submitting again while still registering
+        if self.registering:
+            return
+
         first_password = ""
 
         for input_ in self.parent.query("SubmitInput").results(SubmitInput):
@@ -67,7 +98,32 @@ class VerticalButtons(Vertical):
                     return
         
         # details are entered correctly
-        register_status = controller.register(username, first_password)
+        self.attempt += 1
+        self.set_registering(True)
+        self.__send_update("Registering…")
+
+        self.register(username, first_password, self.attempt)
+
+    @work(thread=True, exclusive=True, group="unlock")
+    def register(self, username: str, password: str, attempt: int):
+        """
+        Register in a worker thread, as hashing would block the UI
+        """
+        worker = get_current_worker()
+        register_status = RegisterController().register(username, password, lambda: worker.is_cancelled)
+
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self.finish_register, register_status, attempt)
+        elif register_status.status:
+            # cancelled while the account was being saved
+            register_status.account.delete_account()
+
+    def finish_register(self, register_status: Status, attempt: int):
+        # attempt was cancelled after the worker finished
+        if attempt != self.attempt:
+            return
+
+        self.set_registering(False)
         self.__send_update(register_status.message)
 
         if register_status.status: